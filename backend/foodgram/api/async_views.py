@@ -0,0 +1,94 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404, JsonResponse
+from django.shortcuts import redirect
+from rest_framework.exceptions import AuthenticationFailed
+
+from api.authentication import CachedTokenAuthentication
+from api.cache import get_recipes_data
+from api.conditional import conditional_response, recipe_validators
+from api.ingredient_index import ingredient_index, search_limit
+from api.tag_catalog import tag_catalog
+from api.views import RecipeViewSet, resolve_short_link
+from recipe.models import Recipe
+
+# Django 3.2 не умеет асинхронно работать с ORM и кешем, поэтому всё
+# обращение к базе и кешу вынесено в один sync_to_async на запрос.
+
+recipe_detail_view = RecipeViewSet.as_view({
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+})
+
+
+def json_response(data, status=200):
+    return JsonResponse(
+        data,
+        status=status,
+        safe=False,
+        json_dumps_params={'ensure_ascii': False}
+    )
+
+
+def not_found():
+    return json_response({'detail': 'Страница не найдена.'}, status=404)
+
+
+def catalog_response(request, catalog, respond):
+    return conditional_response(
+        request, catalog.validators(), lambda: json_response(respond())
+    )
+
+
+async def tag_list(request):
+    return await sync_to_async(catalog_response)(
+        request, tag_catalog, tag_catalog.all
+    )
+
+
+async def ingredient_list(request):
+    limit = request.GET.get('limit', '')
+    return await sync_to_async(catalog_response)(
+        request,
+        ingredient_index,
+        lambda: ingredient_index.search(
+            request.GET.get('name', ''),
+            search_limit(limit)
+        )
+    )
+
+
+def recipe_response(request, pk):
+    authenticated = CachedTokenAuthentication().authenticate(request)
+    user = authenticated[0] if authenticated else AnonymousUser()
+    recipe = Recipe.objects.with_user_flags(user).filter(pk=pk).first()
+    if recipe is None:
+        return not_found()
+    return conditional_response(
+        request,
+        recipe_validators(recipe, user),
+        lambda: json_response(get_recipes_data([recipe], request)[0])
+    )
+
+
+async def recipe_detail(request, pk):
+    if request.method not in ('GET', 'HEAD'):
+        return await sync_to_async(recipe_detail_view)(request, pk=pk)
+    try:
+        return await sync_to_async(recipe_response)(request, pk)
+    except AuthenticationFailed as error:
+        return json_response({'detail': error.detail}, status=401)
+
+
+# Изменения рецепта передаются представлению DRF, которое само
+# освобождено от CSRF; csrf_exempt в Django 3.2 не поддерживает корутины.
+recipe_detail.csrf_exempt = True
+
+
+async def short_link(request, short):
+    recipe_id = await sync_to_async(resolve_short_link)(short)
+    if recipe_id is None:
+        raise Http404
+    return redirect(f'/recipes/{recipe_id}')
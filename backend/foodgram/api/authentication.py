@@ -0,0 +1,60 @@
+import hashlib
+
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from api.db_router import read_database, use_primary
+from api.metrics import registry
+
+TOKEN_CACHE_KEY = 'token:{}'
+
+
+def token_cache():
+    return caches['tokens']
+
+
+def token_cache_key(key):
+    # В кеше хранится только хеш токена.
+    return TOKEN_CACHE_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def forget_token(key):
+    token_cache().delete(token_cache_key(key))
+
+
+def forget_user_tokens(user):
+    token_cache().delete_many([
+        token_cache_key(key)
+        for key in Token.objects.filter(user=user).values_list(
+            'key', flat=True
+        )
+    ])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication с кешем «токен → пользователь».
+
+    Срок жизни и размер кеша задаются алиасом tokens в CACHES. Записи
+    удаляются при удалении токена и при сохранении пользователя
+    (смена пароля, деактивация).
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        cached = token_cache().get(cache_key)
+        if cached is not None:
+            registry.increment('token_cache', 'hit')
+            return cached
+        registry.increment('token_cache', 'miss')
+        try:
+            user, token = super().authenticate_credentials(key)
+        except AuthenticationFailed:
+            if read_database.get() is None:
+                raise
+            # Только что выданного токена может ещё не быть на реплике.
+            with use_primary():
+                user, token = super().authenticate_credentials(key)
+        token_cache().set(cache_key, (user, token))
+        return user, token
@@ -0,0 +1,91 @@
+from django.conf import settings
+
+from api.db_router import use_primary
+from api.recipe_changes import get_recipe_versions, recipe_cache
+from api.serializers import RecipeSerializer
+from recipe.models import Recipe
+
+# Увеличивается при изменении полей RecipeSerializer.
+RECIPE_PAYLOAD_VERSION = 3
+RECIPE_DATA_KEY = 'recipe:{}:{}:' + str(RECIPE_PAYLOAD_VERSION)
+
+
+def get_shared_recipe_data(recipe_ids):
+    """Общая для всех пользователей часть рецептов, с кешированием."""
+    versions = get_recipe_versions(recipe_ids)
+    keys = {
+        RECIPE_DATA_KEY.format(pk, version): pk
+        for pk, version in versions.items()
+    }
+    cache = recipe_cache()
+    data = {keys[key]: value for key, value in cache.get_many(keys).items()}
+    missing = [pk for pk in recipe_ids if pk not in data]
+    if missing:
+        # Данные кешируются под новой версией, поэтому читаются не с
+        # реплики, которая может ещё не получить изменение.
+        with use_primary():
+            recipes = Recipe.objects.with_related().in_bulk(missing)
+            fresh = {
+                pk: RecipeSerializer(recipe).data
+                for pk, recipe in recipes.items()
+            }
+        cache.set_many(
+            {
+                RECIPE_DATA_KEY.format(pk, versions[pk]): value
+                for pk, value in fresh.items()
+            },
+            settings.RECIPE_CACHE_TIMEOUT
+        )
+        data.update(fresh)
+    return data
+
+
+def _absolute_url(request, url):
+    if url is None:
+        return None
+    return request.build_absolute_uri(url)
+
+
+def _absolute_srcset(request, srcset):
+    if srcset is None:
+        return None
+    return {
+        extension: ', '.join(
+            f'{request.build_absolute_uri(url)} {width}'
+            for url, width in (
+                candidate.split(' ') for candidate in value.split(', ')
+            )
+        )
+        for extension, value in srcset.items()
+    }
+
+
+def personalize_recipe_data(data, recipe, request):
+    data = dict(data)
+    data['image'] = _absolute_url(request, data['image'])
+    data['image_srcset'] = _absolute_srcset(request, data['image_srcset'])
+    author = dict(data['author'])
+    author['avatar'] = _absolute_url(request, author['avatar'])
+    author['avatar_srcset'] = _absolute_srcset(
+        request, author['avatar_srcset']
+    )
+    author['is_subscribed'] = getattr(recipe, 'is_author_subscribed', False)
+    data['author'] = author
+    data['is_favorited'] = getattr(recipe, 'is_favorited', False)
+    data['is_in_shopping_cart'] = getattr(
+        recipe, 'is_in_shopping_cart', False
+    )
+    data['favorites_count'] = recipe.favorites_count
+    return data
+
+
+def get_recipes_data(recipes, request):
+    """Представления рецептов: общая часть из кеша плюс флаги и счётчики.
+
+    Рецепты должны быть аннотированы через Recipe.objects.with_user_flags().
+    """
+    shared = get_shared_recipe_data([recipe.pk for recipe in recipes])
+    return [
+        personalize_recipe_data(shared[recipe.pk], recipe, request)
+        for recipe in recipes
+    ]
@@ -0,0 +1,64 @@
+import threading
+import time
+
+from django.conf import settings
+
+from api.db_router import use_primary
+from recipe.models import CatalogVersion
+
+
+class ProcessCatalog:
+    """Копия справочника в памяти процесса.
+
+    Копия перестраивается лениво, когда меняется версия справочника.
+    Версия — время последнего изменения в наносекундах, из неё же
+    строятся ETag и Last-Modified. Она хранится в базе, поэтому
+    изменения из других процессов и команд manage.py видны всем;
+    процесс сверяется с ней не чаще CATALOG_VERSION_CHECK_INTERVAL.
+    """
+
+    version_key = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._known_version = None
+        self._checked = 0
+
+    def invalidate(self):
+        version = time.time_ns()
+        CatalogVersion.objects.update_or_create(
+            name=self.version_key, defaults={'version': version}
+        )
+        self._known_version, self._checked = version, time.monotonic()
+
+    def _current_version(self):
+        now = time.monotonic()
+        if (self._known_version is not None and now - self._checked
+                < settings.CATALOG_VERSION_CHECK_INTERVAL):
+            return self._known_version
+        with use_primary():
+            version = CatalogVersion.objects.get_or_create(
+                name=self.version_key,
+                defaults={'version': time.time_ns()}
+            )[0].version
+        self._known_version, self._checked = version, now
+        return version
+
+    def validators(self):
+        """ETag и Last-Modified справочника без запроса к базе."""
+        version = self._current_version()
+        return f'"{self.version_key}:{version}"', version // 10 ** 9
+
+    def _rebuild(self):
+        raise NotImplementedError
+
+    def _ensure_fresh(self):
+        version = self._current_version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    # Реплика может отставать от уже изменённой версии.
+                    with use_primary():
+                        self._rebuild()
+                    self._version = version
@@ -0,0 +1,116 @@
+import gzip
+import json
+import os
+import tempfile
+from urllib.parse import quote
+
+import brotli
+from django.conf import settings
+
+from api.ingredient_index import INGREDIENT_DEFAULT_LIMIT, ingredient_index
+from api.tag_catalog import tag_catalog
+
+INGREDIENT_SHARDS = 'ingredients'
+ENCODINGS = (
+    ('.br', brotli.compress),
+    ('.gz', lambda content: gzip.compress(content, mtime=0)),
+)
+
+
+def shard_name(prefix):
+    """Имя файла шарда так, как браузер кодирует ?name=<префикс>."""
+    return quote(prefix, safe='') + '.json'
+
+
+def write_atomic(path, content):
+    directory = os.path.dirname(path)
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as file:
+        file.write(content)
+    # mkstemp создаёт файл с правами 0600, а читает его nginx.
+    os.chmod(temporary, 0o644)
+    os.replace(temporary, path)
+
+
+def write_snapshot(path, data):
+    """Пишет JSON и его сжатые копии, возвращает, изменился ли файл.
+
+    Неизменившиеся файлы не трогаются: у nginx остаются прежние ETag.
+    Сжатые копии пишутся раньше исходного файла.
+    """
+    content = json.dumps(
+        data, ensure_ascii=False, separators=(',', ':')
+    ).encode()
+    try:
+        with open(path, 'rb') as file:
+            if file.read() == content:
+                return False
+    except FileNotFoundError:
+        pass
+    for suffix, compress in ENCODINGS:
+        write_atomic(path + suffix, compress(content))
+    write_atomic(path, content)
+    return True
+
+
+def snapshot_root(root=None):
+    root = root or settings.CATALOG_SNAPSHOT_ROOT
+    if root:
+        os.makedirs(os.path.join(root, INGREDIENT_SHARDS), exist_ok=True)
+    return root
+
+
+def write_tag_snapshot(root=None):
+    """Снимок /api/tags/; возвращает число изменённых файлов."""
+    root = snapshot_root(root)
+    if not root:
+        return 0
+    return int(write_snapshot(
+        os.path.join(root, 'tags.json'), tag_catalog.all()
+    ))
+
+
+def write_ingredient_snapshots(root=None):
+    """Снимки /api/ingredients/ и /api/ingredients/?name=<префикс>.
+
+    Шарды строятся для всех префиксов названий не длиннее
+    CATALOG_SNAPSHOT_PREFIX_LENGTH; более длинные запросы обслуживает
+    Django. Снимки ограничены INGREDIENT_DEFAULT_LIMIT записями, как и
+    ответ Django без ?limit=. Возвращает число изменённых файлов.
+    """
+    root = snapshot_root(root)
+    if not root:
+        return 0
+    changed = write_snapshot(
+        os.path.join(root, 'ingredients.json'),
+        ingredient_index.search('', INGREDIENT_DEFAULT_LIMIT)
+    )
+    max_length = settings.CATALOG_SNAPSHOT_PREFIX_LENGTH
+    keys = {item['name'].lower() for item in ingredient_index.search()}
+    prefixes = {
+        key[:length]
+        for key in keys
+        for length in range(1, min(max_length, len(key)) + 1)
+    }
+    directory = os.path.join(root, INGREDIENT_SHARDS)
+    names = set()
+    for prefix in prefixes:
+        name = shard_name(prefix)
+        names.add(name)
+        changed += write_snapshot(
+            os.path.join(directory, name),
+            ingredient_index.search(prefix, INGREDIENT_DEFAULT_LIMIT)
+        )
+    # Шарды исчезнувших префиксов удаляются вместе со сжатыми копиями.
+    for name in os.listdir(directory):
+        base = name
+        for suffix, _ in ENCODINGS:
+            base = base.removesuffix(suffix)
+        if base.endswith('.json') and base not in names:
+            os.remove(os.path.join(directory, name))
+            changed += name == base
+    return changed
+
+
+def write_catalog_snapshots(root=None):
+    return write_tag_snapshot(root) + write_ingredient_snapshots(root)
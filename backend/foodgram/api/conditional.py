@@ -0,0 +1,49 @@
+import hashlib
+from calendar import timegm
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from api.cache import RECIPE_PAYLOAD_VERSION
+
+
+def recipe_validators(recipe, user):
+    """ETag и Last-Modified рецепта, аннотированного with_user_flags().
+
+    Флаги пользователя есть только в ETag, поэтому Last-Modified
+    отдаётся лишь анонимам.
+    """
+    parts = (
+        RECIPE_PAYLOAD_VERSION,
+        recipe.pk,
+        recipe.updated_at.isoformat(),
+        recipe.favorites_count,
+        getattr(recipe, 'is_favorited', False),
+        getattr(recipe, 'is_in_shopping_cart', False),
+        getattr(recipe, 'is_author_subscribed', False),
+    )
+    etag = hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+    last_modified = (
+        None if user.is_authenticated
+        else timegm(recipe.updated_at.utctimetuple())
+    )
+    return f'"{etag}"', last_modified
+
+
+def conditional_response(request, validators, respond):
+    """304, если валидаторы клиента совпали, иначе ответ respond().
+
+    respond вызывается только при несовпадении, так что сериализация
+    пропускается целиком.
+    """
+    etag, last_modified = validators
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = respond()
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+    return response
@@ -0,0 +1,56 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Алиас реплики для чтений текущего запроса; None — основная база.
+read_database = ContextVar('read_database', default=None)
+
+
+def choose_replica():
+    if not settings.DATABASE_REPLICAS:
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+@contextmanager
+def reads_from(alias):
+    token = read_database.set(alias)
+    try:
+        yield
+    finally:
+        read_database.reset(token)
+
+
+def use_primary():
+    """Чтения внутри блока идут в основную базу.
+
+    Нужно там, где сразу после записи читается только что записанное.
+    """
+    return reads_from(None)
+
+
+class ReplicaRouter:
+    """Пишет в основную базу, читает с реплики, выбранной для запроса.
+
+    Вне запросов (команды, миграции) и внутри транзакции всё идёт
+    в основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = read_database.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,40 @@
+from django.core.files.storage import default_storage
+from rest_framework import serializers
+
+from recipe.image_variants import (VARIANT_FORMATS, variant_path,
+                                   variant_widths)
+
+
+class ImageSrcsetField(serializers.ReadOnlyField):
+    """srcset для каждого формата по хешу и ширине изображения.
+
+    В srcset попадают только сохранённые копии с их настоящей шириной.
+    Пока ширина не известна (изображения, загруженные до её учёта),
+    перечисляются все ширины.
+    """
+
+    def __init__(self, widths, hash_field, width_field, **kwargs):
+        self.widths = widths
+        self.hash_field = hash_field
+        self.width_field = width_field
+        super().__init__(source='*', **kwargs)
+
+    def to_representation(self, instance):
+        content_hash = getattr(instance, self.hash_field)
+        if not content_hash:
+            return None
+        width = getattr(instance, self.width_field)
+        widths = variant_widths(self.widths, width) if width else self.widths
+        request = self.context.get('request')
+        srcset = {}
+        for extension in VARIANT_FORMATS:
+            candidates = []
+            for width in widths:
+                url = default_storage.url(
+                    variant_path(content_hash, width, extension)
+                )
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                candidates.append(f'{url} {width}w')
+            srcset[extension] = ', '.join(candidates)
+        return srcset
@@ -1,25 +1,19 @@
 import django_filters
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import filters
 
-from recipe.models import Ingredient, Recipe
-
-
-class NameFilter(django_filters.FilterSet):
-
-    name = django_filters.CharFilter(
-        field_name='name',
-        lookup_expr='startswith'
-    )
-
-    class Meta:
-        model = Ingredient
-        fields = []
+from api.tag_catalog import tag_catalog, tag_choices
+from recipe.models import Favorite, Recipe, ShoppingCart
 
 
 class NameAuthorFilter(django_filters.FilterSet):
 
     author = django_filters.NumberFilter(lookup_expr='id__exact')
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = filters.MultipleChoiceFilter(
+        choices=tag_choices,
+        method='filter_tags'
+    )
+    search = django_filters.CharFilter(method='filter_search')
     is_favorited = django_filters.rest_framework.filters.BooleanFilter(
         method='favorited'
     )
@@ -31,18 +25,32 @@ class NameAuthorFilter(django_filters.FilterSet):
         model = Recipe
         fields = []
 
+    def filter_tags(self, queryset, name, value):
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'),
+            tag_id__in=tag_catalog.ids_for_slugs(value)
+        )))
+
+    def filter_search(self, queryset, name, value):
+        return queryset.search(value).order_by('-search_rank', '-id')
+
+    @staticmethod
+    def filter_user_recipes(queryset, model, user, value):
+        # Список id из индекса (user, recipe) вместо проверки EXISTS
+        # для каждого рецепта: иначе читается вся таблица рецептов.
+        recipe_ids = model.objects.filter(user=user).values('recipe_id')
+        if value:
+            return queryset.filter(pk__in=recipe_ids)
+        return queryset.exclude(pk__in=recipe_ids)
+
     def favorited(self, queryset, name, value):
         user = self.request.user
         if user.is_anonymous:
             return queryset
-        if value:
-            return queryset.filter(favorites__user=user)
-        return queryset.exclude(favorites__user=user)
+        return self.filter_user_recipes(queryset, Favorite, user, value)
 
     def shopping_cart(self, queryset, name, value):
         user = self.request.user
         if user.is_anonymous:
             return queryset
-        if value:
-            return queryset.filter(carts__user=user)
-        return queryset.exclude(carts__user=user)
+        return self.filter_user_recipes(queryset, ShoppingCart, user, value)
@@ -0,0 +1,69 @@
+from bisect import bisect_left
+
+from api.catalog import ProcessCatalog
+from recipe.models import Ingredient
+
+MAX_CHAR = chr(0x10FFFF)
+INGREDIENT_DEFAULT_LIMIT = 50
+INGREDIENT_MAX_LIMIT = 500
+
+
+def search_limit(limit):
+    """Размер выдачи для ?limit=: по умолчанию и не больше максимума."""
+    return min(
+        int(limit) if limit.isdigit() and int(limit) > 0
+        else INGREDIENT_DEFAULT_LIMIT,
+        INGREDIENT_MAX_LIMIT
+    )
+
+
+class IngredientIndex(ProcessCatalog):
+    """Отсортированный индекс имён ингредиентов для поиска по префиксу."""
+
+    version_key = 'ingredients:index:version'
+
+    def __init__(self):
+        super().__init__()
+        # Ключи, записи и словари по id и (имя, единица) заменяются
+        # одним присваиванием, чтобы поиск не увидел их вперемешку.
+        self._state = ([], [], {}, {})
+
+    def _rebuild(self):
+        rows = sorted(
+            Ingredient.objects.values_list('id', 'name', 'measurement_unit'),
+            key=lambda row: (row[1].lower(), row[0])
+        )
+        items = [
+            {'id': pk, 'name': name, 'measurement_unit': unit}
+            for pk, name, unit in rows
+        ]
+        self._state = (
+            [name.lower() for _, name, _ in rows],
+            items,
+            {item['id']: item for item in items},
+            {
+                (item['name'], item['measurement_unit']): item
+                for item in items
+            },
+        )
+
+    def get(self, pk):
+        self._ensure_fresh()
+        return self._state[2].get(pk)
+
+    def find(self, name, measurement_unit):
+        self._ensure_fresh()
+        return self._state[3].get((name, measurement_unit))
+
+    def search(self, prefix='', limit=None):
+        self._ensure_fresh()
+        keys, items, _, _ = self._state
+        prefix = prefix.lower()
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + MAX_CHAR, lo=start)
+        if limit is not None:
+            end = min(end, start + limit)
+        return items[start:end]
+
+
+ingredient_index = IngredientIndex()
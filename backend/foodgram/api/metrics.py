@@ -0,0 +1,206 @@
+import hmac
+import logging
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+slow_query_logger = logging.getLogger('foodgram.slow_sql')
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Histogram:
+
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, view, value):
+        series = self.series.setdefault(
+            view, {'buckets': [0] * len(self.buckets), 'sum': 0, 'count': 0}
+        )
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series['buckets'][index] += 1
+        series['sum'] += value
+        series['count'] += 1
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.description}',
+            f'# TYPE {self.name} histogram',
+        ]
+        for view, series in sorted(self.series.items()):
+            labels = f'view="{view}"'
+            for bound, count in zip(self.buckets, series['buckets']):
+                lines.append(
+                    f'{self.name}_bucket{{{labels},le="{bound}"}} {count}'
+                )
+            lines.append(
+                f'{self.name}_bucket{{{labels},le="+Inf"}} {series["count"]}'
+            )
+            lines.append(f'{self.name}_sum{{{labels}}} {series["sum"]}')
+            lines.append(f'{self.name}_count{{{labels}}} {series["count"]}')
+        return lines
+
+
+class Counter:
+
+    def __init__(self, name, description, label):
+        self.name = name
+        self.description = description
+        self.label = label
+        self.values = {}
+
+    def increment(self, value):
+        self.values[value] = self.values.get(value, 0) + 1
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.description}',
+            f'# TYPE {self.name} counter',
+        ]
+        for value, count in sorted(self.values.items()):
+            lines.append(f'{self.name}{{{self.label}="{value}"}} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """Гистограммы по представлениям и счётчики в памяти процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {
+            'duration': Histogram(
+                'foodgram_request_duration_seconds',
+                'Время обработки запроса.', DURATION_BUCKETS
+            ),
+            'queries': Histogram(
+                'foodgram_db_queries',
+                'Число SQL-запросов на запрос.', QUERY_BUCKETS
+            ),
+            'db': Histogram(
+                'foodgram_db_duration_seconds',
+                'Суммарное время SQL на запрос.', DURATION_BUCKETS
+            ),
+            'serialize': Histogram(
+                'foodgram_serialize_duration_seconds',
+                'Время сериализации на запрос.', DURATION_BUCKETS
+            ),
+            'size': Histogram(
+                'foodgram_response_size_bytes',
+                'Размер ответа.', SIZE_BUCKETS
+            ),
+        }
+        self.counters = {
+            'token_cache': Counter(
+                'foodgram_token_cache_total',
+                'Обращения к кешу токенов.', 'result'
+            ),
+        }
+
+    def observe(self, view, **values):
+        with self.lock:
+            for name, value in values.items():
+                if value is not None:
+                    self.histograms[name].observe(view, value)
+
+    def increment(self, name, value):
+        with self.lock:
+            self.counters[name].increment(value)
+
+    def render(self):
+        with self.lock:
+            lines = []
+            for histogram in self.histograms.values():
+                lines.extend(histogram.render())
+            for counter in self.counters.values():
+                lines.extend(counter.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetrics:
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = None
+
+    def add_serialize_time(self, duration):
+        self.serialize_time = (self.serialize_time or 0.0) + duration
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            self.db_time += duration
+            threshold = settings.SLOW_QUERY_THRESHOLD_MS
+            if threshold is not None and duration * 1000 >= threshold:
+                slow_query_logger.warning(
+                    'Медленный запрос %.1f мс: %s\n%s',
+                    duration * 1000, sql,
+                    ''.join(traceback.format_stack(limit=15)[:-2])
+                )
+
+
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+@contextmanager
+def serialization_timer():
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = current_metrics.get()
+        if metrics is not None:
+            metrics.add_serialize_time(time.perf_counter() - started)
+
+
+class SerializationTimingMixin:
+    """Учитывает время to_representation сериализаторов представления."""
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        to_representation = serializer.to_representation
+
+        def timed_to_representation(*args, **kwargs):
+            with serialization_timer():
+                return to_representation(*args, **kwargs)
+
+        serializer.to_representation = timed_to_representation
+        return serializer
+
+
+def metrics_view(request):
+    """Метрики в формате Prometheus, только с токеном METRICS_TOKEN.
+
+    Без настроенного токена эндпоинт закрыт.
+    """
+    token = settings.METRICS_TOKEN
+    if not token or not hmac.compare_digest(
+        request.headers.get('Authorization', '').encode(),
+        f'Bearer {token}'.encode()
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.permissions import SAFE_METHODS
+
+from api.db_router import choose_replica, reads_from
+from api.metrics import RequestMetrics, current_metrics, registry
+
+PRIMARY_COOKIE = 'primary_until'
+PRIMARY_CACHE_KEY = 'primary:{}'
+
+
+def view_label(view_func, method):
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return view_func.__name__
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(method.lower(), method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+class RequestMetricsMiddleware(MiddlewareMixin):
+    """Число и время SQL-запросов, время сериализации и размер ответа.
+
+    Значения отдаются заголовком Server-Timing и копятся в гистограммах
+    для /api/_metrics/. Для асинхронных представлений запросы к базе
+    выполняются в других потоках и не учитываются.
+    """
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.execute_wrapper)
+                    )
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.record(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        return self.record(request, response, None, started)
+
+    def record(self, request, response, metrics, started):
+        duration = time.perf_counter() - started
+        timings = []
+        if metrics is not None:
+            timings.append(
+                f'db;dur={metrics.db_time * 1000:.1f};'
+                f'desc="{metrics.queries} queries"'
+            )
+            if metrics.serialize_time is not None:
+                timings.append(
+                    f'serialize;dur={metrics.serialize_time * 1000:.1f}'
+                )
+        timings.append(f'total;dur={duration * 1000:.1f}')
+        response['Server-Timing'] = ', '.join(timings)
+        label = getattr(request, 'metrics_view', None)
+        if label is not None:
+            registry.observe(
+                label,
+                duration=duration,
+                queries=metrics and metrics.queries,
+                db=metrics and metrics.db_time,
+                serialize=metrics and metrics.serialize_time,
+                size=None if response.streaming else len(response.content),
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view = view_label(view_func, request.method)
+
+
+def primary_cache_key(request):
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if not header:
+        return None
+    return PRIMARY_CACHE_KEY.format(
+        hashlib.sha256(header.encode()).hexdigest()
+    )
+
+
+class ReplicaMiddleware(MiddlewareMixin):
+    """Безопасные запросы читают с реплик, остальные — с основной базы.
+
+    После записи клиент ещё REPLICA_STICKY_SECONDS читает с основной
+    базы, чтобы видеть свои изменения несмотря на отставание реплик.
+    Клиент узнаётся по cookie, а с токеном — ещё и по записи в кеше.
+    """
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        with reads_from(self.read_database(request)):
+            response = self.get_response(request)
+        return self.stick(request, response)
+
+    async def __acall__(self, request):
+        with reads_from(self.read_database(request)):
+            response = await self.get_response(request)
+        return self.stick(request, response)
+
+    def read_database(self, request):
+        if request.method not in SAFE_METHODS:
+            return None
+        try:
+            until = float(request.COOKIES.get(PRIMARY_COOKIE, 0))
+        except ValueError:
+            until = 0
+        if until > time.time():
+            return None
+        key = primary_cache_key(request)
+        if key is not None and cache.get(key):
+            return None
+        return choose_replica()
+
+    def stick(self, request, response):
+        seconds = settings.REPLICA_STICKY_SECONDS
+        if request.method in SAFE_METHODS or not seconds:
+            return response
+        response.set_cookie(
+            PRIMARY_COOKIE,
+            str(time.time() + seconds),
+            max_age=seconds,
+            httponly=True,
+            samesite='Lax'
+        )
+        key = primary_cache_key(request)
+        if key is not None:
+            cache.set(key, True, seconds)
+        return response
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class RecipePaginator(Paginator):
+
+    @cached_property
+    def count(self):
+        # Аннотации флагов пользователя не нужны для подсчёта.
+        return self.object_list.values('pk').count()
+
+
+class RecipeCursorPagination(CursorPagination):
+    ordering = '-id'
+
+
+class RecipePagination(PageNumberPagination):
+    """Постраничная выдача рецептов с опциональным режимом курсора.
+
+    Курсорный режим (keyset по -id) не делает COUNT(*) и OFFSET, поэтому
+    глубокие страницы стоят столько же, сколько первая. Включается
+    параметром ?pagination=cursor или настройкой RECIPE_CURSOR_PAGINATION.
+    Результаты поиска упорядочены по релевантности и листаются только
+    по страницам.
+    """
+
+    django_paginator_class = RecipePaginator
+    mode_query_param = 'pagination'
+    search_query_param = 'search'
+
+    def use_cursor(self, request):
+        if request.query_params.get(self.search_query_param):
+            return False
+        return (
+            settings.RECIPE_CURSOR_PAGINATION
+            or request.query_params.get(self.mode_query_param) == 'cursor'
+            or RecipeCursorPagination.cursor_query_param
+            in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.use_cursor(request):
+            self.cursor_paginator = RecipeCursorPagination()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,186 @@
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+
+from api.db_router import use_primary
+from recipe.models import PantryChange, RecipeIngredient
+
+# При большем отставании дешевле перестроить индекс целиком; столько же
+# последних записей журнала хранится в базе.
+MAX_PENDING_CHANGES = 1000
+
+
+class PantryIndex:
+    """Обратный индекс «ингредиент → отсортированный массив id рецептов».
+
+    Индекс живёт в памяти процесса. Изменения рецептов записываются в
+    журнал PantryChange, версия индекса — последний id журнала, и каждый
+    процесс дочитывает из базы только изменённые рецепты. Индекс
+    перестраивается целиком, только если нужных записей журнала уже нет.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._known_version = None
+        self._checked = 0
+        self._recipes_by_ingredient = {}
+        self._ingredients_by_recipe = {}
+
+    def _last_change_id(self):
+        return PantryChange.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0
+
+    def _log(self, recipe_ids):
+        changes = PantryChange.objects.bulk_create(
+            PantryChange(recipe_id=recipe_id) for recipe_id in recipe_ids
+        )
+        # SQLite не возвращает id из bulk_create.
+        if changes[-1].id is None:
+            with use_primary():
+                version = self._last_change_id()
+        else:
+            version = max(change.id for change in changes)
+        PantryChange.objects.filter(
+            id__lte=version - MAX_PENDING_CHANGES
+        ).delete()
+        self._known_version, self._checked = version, time.monotonic()
+
+    def mark_changed(self, recipe_ids):
+        recipe_ids = sorted(set(recipe_ids))
+        if recipe_ids:
+            self._log(recipe_ids)
+
+    def invalidate(self):
+        self._log([None])
+
+    def _current_version(self):
+        now = time.monotonic()
+        if (self._known_version is not None and now - self._checked
+                < settings.CATALOG_VERSION_CHECK_INTERVAL):
+            return self._known_version
+        with use_primary():
+            version = self._last_change_id()
+        self._known_version, self._checked = version, now
+        return version
+
+    def _rebuild(self):
+        # Сортировка в Python быстрее ORDER BY и поэлементной группировки.
+        rows = list(RecipeIngredient.objects.order_by().values_list(
+            'ingredient_id', 'recipe_id'
+        ).iterator(chunk_size=10000))
+        rows.sort()
+        recipes_by_ingredient = {
+            ingredient_id: array('q', map(itemgetter(1), group))
+            for ingredient_id, group in groupby(rows, itemgetter(0))
+        }
+        rows.sort(key=itemgetter(1))
+        ingredients_by_recipe = {
+            recipe_id: array('q', map(itemgetter(0), group))
+            for recipe_id, group in groupby(rows, itemgetter(1))
+        }
+        self._recipes_by_ingredient = recipes_by_ingredient
+        self._ingredients_by_recipe = ingredients_by_recipe
+
+    def _apply_changes(self, recipe_ids):
+        current = {}
+        for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('ingredient_id').values_list('recipe_id', 'ingredient_id'):
+            current.setdefault(recipe_id, array('q')).append(ingredient_id)
+        for recipe_id in recipe_ids:
+            old = set(self._ingredients_by_recipe.get(recipe_id, ()))
+            new = current.get(recipe_id)
+            for ingredient_id in old - set(new or ()):
+                recipes = self._recipes_by_ingredient[ingredient_id]
+                del recipes[bisect_left(recipes, recipe_id)]
+            for ingredient_id in set(new or ()) - old:
+                insort(
+                    self._recipes_by_ingredient.setdefault(
+                        ingredient_id, array('q')
+                    ),
+                    recipe_id
+                )
+            if new:
+                self._ingredients_by_recipe[recipe_id] = new
+            else:
+                self._ingredients_by_recipe.pop(recipe_id, None)
+
+    def _pending_changes(self, version):
+        recipe_ids = list(PantryChange.objects.filter(
+            id__gt=self._version, id__lte=version
+        ).values_list('recipe_id', flat=True))
+        # Пропуск в номерах — запись удалена из журнала или ещё не
+        # закоммичена; изменения самих рецептов к этому моменту уже в
+        # базе, так что перестройка их учтёт.
+        if len(recipe_ids) != version - self._version or None in recipe_ids:
+            return None
+        return set(recipe_ids)
+
+    def _ensure_fresh(self):
+        version = self._current_version()
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            # Реплика может отставать от уже увеличенной версии.
+            with use_primary():
+                changes = None
+                if (self._version is not None and 0 < version
+                        - self._version <= MAX_PENDING_CHANGES):
+                    changes = self._pending_changes(version)
+                if changes is None:
+                    self._rebuild()
+                else:
+                    self._apply_changes(changes)
+            self._version = version
+
+    def match(self, ingredient_ids, limit):
+        """Рецепты с наибольшей долей имеющихся ингредиентов.
+
+        Возвращает список (id рецепта, доля, id недостающих ингредиентов).
+        """
+        self._ensure_fresh()
+        with self._lock:
+            return self._match(set(ingredient_ids), limit)
+
+    def _match(self, pantry, limit):
+        ingredients_by_recipe = self._ingredients_by_recipe
+        matched = Counter()
+        for ingredient_id in pantry:
+            recipes = self._recipes_by_ingredient.get(ingredient_id)
+            if recipes:
+                matched.update(recipes)
+        best = heapq.nlargest(
+            limit,
+            matched.items(),
+            key=lambda item: (
+                item[1] / len(ingredients_by_recipe[item[0]]),
+                item[1],
+                item[0],
+            )
+        )
+        return [
+            (
+                recipe_id,
+                count / len(ingredients_by_recipe[recipe_id]),
+                [
+                    ingredient_id
+                    for ingredient_id in ingredients_by_recipe[recipe_id]
+                    if ingredient_id not in pantry
+                ],
+            )
+            for recipe_id, count in best
+        ]
+
+
+pantry_index = PantryIndex()
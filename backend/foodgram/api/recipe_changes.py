@@ -0,0 +1,64 @@
+"""Версии рецептов в кеше и отметки об изменении рецептов.
+
+Модуль не зависит от сериализаторов, поэтому его функции можно вызывать
+и из сигналов, и из сериализаторов, которые меняют рецепты в обход
+сигналов (bulk_create, bulk_update).
+"""
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from api.pantry_index import pantry_index
+from recipe.models import Recipe
+
+RECIPE_VERSION_KEY = 'recipe:{}:version'
+
+
+def recipe_cache():
+    # Отдельный алиас: данные рецептов не вытесняют служебные ключи
+    # кеша по умолчанию.
+    return caches['recipes']
+
+
+def _new_version():
+    return time.time_ns()
+
+
+def bump_recipe_versions(recipe_ids):
+    cache = recipe_cache()
+    for recipe_id in set(recipe_ids):
+        key = RECIPE_VERSION_KEY.format(recipe_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), None)
+
+
+def get_recipe_versions(recipe_ids):
+    cache = recipe_cache()
+    keys = {RECIPE_VERSION_KEY.format(pk): pk for pk in recipe_ids}
+    versions = {
+        keys[key]: version for key, version in cache.get_many(keys).items()
+    }
+    for key, pk in keys.items():
+        if pk not in versions:
+            cache.add(key, _new_version(), None)
+            versions[pk] = cache.get(key)
+    return versions
+
+
+def invalidate_recipes(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    transaction.on_commit(lambda: bump_recipe_versions(recipe_ids))
+
+
+def touch_recipes(recipe_ids):
+    """Сдвигает updated_at рецептов, чьё представление изменилось."""
+    Recipe.objects.filter(pk__in=recipe_ids).update(updated_at=timezone.now())
+
+
+def refresh_pantry_index(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    transaction.on_commit(lambda: pantry_index.mark_changed(recipe_ids))
@@ -0,0 +1,321 @@
+import json
+import uuid
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.storage import default_storage
+from django.db import transaction
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework.exceptions import ValidationError
+
+from api.ingredient_index import ingredient_index
+from api.pantry_index import pantry_index
+from api.tag_catalog import tag_catalog
+from recipe.counters import change_counter
+from recipe.feed import fan_out
+from recipe.image_variants import RECIPE_IMAGE_WIDTHS, create_image_variants
+from recipe.models import Ingredient, Recipe, RecipeIngredient, Tag, User
+from recipe.search import search_backend
+from recipe.short_links import encode_short_link
+
+IMPORT_BATCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 500
+IMAGE_PREFIX = Recipe._meta.get_field('image').upload_to + '/'
+NAME_MAX_LENGTH = Recipe._meta.get_field('name').max_length
+
+
+def positive_int(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+class RecipeImporter:
+    """Импорт рецептов из NDJSON: одна строка — один рецепт.
+
+    Строки проверяются без запросов к базе (теги и ингредиенты берутся
+    из каталогов в памяти) и сохраняются пачками: несколько bulk_create
+    на пачку в одной транзакции.
+    """
+
+    def __init__(self, author, batch_size=IMPORT_BATCH_SIZE):
+        self.author = author
+        self.batch_size = batch_size
+        self.created = 0
+        self.errors = []
+        self._found = {}
+
+    def run(self, lines):
+        batch = []
+        for number, line in enumerate(lines, 1):
+            if isinstance(line, bytes):
+                line = line.decode()
+            if not line.strip():
+                continue
+            record = self.parse(number, line)
+            if record is not None:
+                batch.append(record)
+            if len(batch) >= self.batch_size:
+                self.save(batch)
+                batch = []
+        if batch:
+            self.save(batch)
+        return self
+
+    def lookup(self, key, find):
+        # Каталоги сверяют версию с базой при обращениях, поэтому
+        # найденное запоминается на время импорта.
+        if key not in self._found:
+            self._found[key] = find()
+        return self._found[key]
+
+    def error(self, number, errors):
+        self.errors.append({'line': number, 'errors': errors})
+
+    def parse(self, number, line):
+        try:
+            data = json.loads(line)
+        except ValueError:
+            self.error(number, {'json': 'Строка не является JSON'})
+            return None
+        if not isinstance(data, dict):
+            self.error(number, {'json': 'Ожидается объект'})
+            return None
+        errors = {}
+        name = data.get('name')
+        if not isinstance(name, str) or not name.strip():
+            errors['name'] = 'Нет названия'
+        elif len(name) > NAME_MAX_LENGTH:
+            errors['name'] = f'Не длиннее {NAME_MAX_LENGTH} символов'
+        if not isinstance(data.get('text'), str) or not data['text'].strip():
+            errors['text'] = 'Нет описания'
+        if not positive_int(data.get('cooking_time')):
+            errors['cooking_time'] = 'Ожидается целое число больше нуля'
+        tag_ids = self.parse_tags(data.get('tags'), errors)
+        ingredients = self.parse_ingredients(data.get('ingredients'), errors)
+        image, image_hash, image_width = self.parse_image(
+            data.get('image'), errors
+        )
+        if errors:
+            self.error(number, errors)
+            return None
+        return {
+            'recipe': Recipe(
+                author=self.author,
+                name=name,
+                title=data.get('title') or name,
+                text=data['text'],
+                cooking_time=data['cooking_time'],
+                image=image,
+                image_hash=image_hash,
+                image_width=image_width,
+                short=f'import-{uuid.uuid4().hex}',
+            ),
+            'tag_ids': tag_ids,
+            'ingredients': ingredients,
+        }
+
+    def parse_tags(self, tags, errors):
+        if not isinstance(tags, list) or not tags:
+            errors['tags'] = 'Нет тегов'
+            return None
+        if len(tags) != len(set(map(str, tags))):
+            errors['tags'] = 'Есть одинаковые теги'
+            return None
+        tag_ids = []
+        for tag in tags:
+            if isinstance(tag, int):
+                found = self.lookup(('tag', tag), lambda: tag_catalog.get(tag))
+                tag_id = found and found['id']
+            elif isinstance(tag, str):
+                tag_id = self.lookup(('slug', tag), lambda: next(
+                    iter(tag_catalog.ids_for_slugs([tag])), None
+                ))
+            else:
+                tag_id = None
+            if tag_id is None:
+                errors['tags'] = f'Неизвестный тег {tag}'
+                return None
+            tag_ids.append(tag_id)
+        return tag_ids
+
+    def parse_ingredients(self, ingredients, errors):
+        if not isinstance(ingredients, list) or not ingredients:
+            errors['ingredients'] = 'В рецепте нет ингредиентов'
+            return None
+        amounts = {}
+        for item in ingredients:
+            if not isinstance(item, dict):
+                errors['ingredients'] = 'Ожидается список объектов'
+                return None
+            found = None
+            if 'id' in item:
+                pk = item['id']
+                if isinstance(pk, int):
+                    found = self.lookup(
+                        ('ingredient', pk), lambda: ingredient_index.get(pk)
+                    )
+            else:
+                key = (item.get('name'), item.get('measurement_unit'))
+                if all(isinstance(value, str) for value in key):
+                    found = self.lookup(
+                        key, lambda: ingredient_index.find(*key)
+                    )
+            if found is None:
+                errors['ingredients'] = f'Неизвестный ингредиент {item}'
+                return None
+            if not positive_int(item.get('amount')):
+                errors['ingredients'] = f'Неверное количество {item}'
+                return None
+            if found['id'] in amounts:
+                errors['ingredients'] = 'Есть одинаковые ингредиенты'
+                return None
+            amounts[found['id']] = item['amount']
+        return amounts
+
+    def parse_image(self, image, errors):
+        """Картинка, хеш её содержимого и ширина; копии создаются сразу.
+
+        bulk_create не вызывает Recipe.save, поэтому хеш и копии
+        готовятся здесь.
+        """
+        if not isinstance(image, str) or not image:
+            errors['image'] = 'Нет картинки'
+            return None, '', 0
+        if image.startswith(IMAGE_PREFIX):
+            # Уже загруженный файл, например из экспорта этого сервиса.
+            if '..' in image or not default_storage.exists(image):
+                errors['image'] = 'Файл не найден'
+                return None, '', 0
+            with default_storage.open(image) as file:
+                return (image, *self.create_variants(file, errors))
+        try:
+            file = Base64ImageField().to_internal_value(image)
+        except ValidationError as error:
+            errors['image'] = [str(detail) for detail in error.detail]
+            return None, '', 0
+        except DjangoValidationError as error:
+            # Нераспознанную картинку поле отклоняет исключением Django.
+            errors['image'] = error.messages
+            return None, '', 0
+        return (file, *self.create_variants(file, errors))
+
+    def create_variants(self, file, errors):
+        try:
+            return create_image_variants(file, RECIPE_IMAGE_WIDTHS)
+        except (OSError, ValueError):
+            errors['image'] = 'Не удалось обработать картинку'
+            return '', 0
+
+    def save(self, batch):
+        recipes = [record['recipe'] for record in batch]
+        with transaction.atomic():
+            Recipe.objects.bulk_create(recipes)
+            # bulk_create возвращает id не во всех базах, поэтому рецепты
+            # находятся по временным уникальным коротким ссылкам.
+            ids = dict(Recipe.objects.filter(
+                short__in=[recipe.short for recipe in recipes]
+            ).values_list('short', 'id'))
+            for recipe in recipes:
+                recipe.pk = ids[recipe.short]
+                recipe.short = encode_short_link(recipe.pk)
+            Recipe.objects.bulk_update(recipes, ['short'])
+            Recipe.tags.through.objects.bulk_create([
+                Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+                for record, recipe in zip(batch, recipes)
+                for tag_id in record['tag_ids']
+            ])
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(
+                    recipe_id=recipe.pk,
+                    ingredient_id=ingredient_id,
+                    amount=amount
+                )
+                for record, recipe in zip(batch, recipes)
+                for ingredient_id, amount in record['ingredients'].items()
+            ])
+            # bulk_create не отправляет сигналы: счётчик, ленты, поисковый
+            # и обратный индексы обновляются явно.
+            change_counter(
+                User, self.author.pk, 'recipes_count', len(recipes)
+            )
+            recipe_ids = [recipe.pk for recipe in recipes]
+            fan_out(self.author.pk, recipe_ids)
+            search_backend().update(recipes)
+            transaction.on_commit(
+                lambda: pantry_index.mark_changed(recipe_ids)
+            )
+        self.created += len(recipes)
+
+
+EXPORT_FIELDS = (
+    'id', 'name', 'title', 'text', 'cooking_time', 'image', 'author__email'
+)
+
+
+def from_catalog(ids, get, queryset):
+    """Записи каталога по id.
+
+    Копия каталога в памяти процесса может ещё не знать о только что
+    созданных записях, их значения читаются из базы.
+    """
+    found = {}
+    for pk in ids:
+        item = get(pk)
+        if item is not None:
+            found[pk] = item
+    missing = set(ids) - found.keys()
+    if missing:
+        found.update(
+            (item['id'], item) for item in queryset.filter(pk__in=missing)
+        )
+    return found
+
+
+def export_chunk(rows):
+    """Дополняет строки рецептов тегами и ингредиентами из каталогов."""
+    recipe_ids = [row['id'] for row in rows]
+    recipe_tags = list(Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('tag_id').values_list('recipe_id', 'tag_id'))
+    catalog = from_catalog(
+        {tag_id for _, tag_id in recipe_tags},
+        tag_catalog.get,
+        Tag.objects.values('id', 'slug')
+    )
+    tags = {}
+    for recipe_id, tag_id in recipe_tags:
+        tags.setdefault(recipe_id, []).append(catalog[tag_id]['slug'])
+    amounts = list(RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('pk').values_list('recipe_id', 'ingredient_id', 'amount'))
+    catalog = from_catalog(
+        {ingredient_id for _, ingredient_id, _ in amounts},
+        ingredient_index.get,
+        Ingredient.objects.values('id', 'name', 'measurement_unit')
+    )
+    ingredients = {}
+    for recipe_id, ingredient_id, amount in amounts:
+        ingredient = catalog[ingredient_id]
+        ingredients.setdefault(recipe_id, []).append({
+            'name': ingredient['name'],
+            'measurement_unit': ingredient['measurement_unit'],
+            'amount': amount,
+        })
+    for row in rows:
+        row['author'] = row.pop('author__email')
+        row['tags'] = tags.get(row['id'], [])
+        row['ingredients'] = ingredients.get(row['id'], [])
+    return rows
+
+
+def export_lines(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Строки NDJSON; рецепты читаются пачками по возрастанию id."""
+    last_id = 0
+    while True:
+        rows = list(
+            queryset.filter(pk__gt=last_id).order_by('pk')
+            .values(*EXPORT_FIELDS)[:chunk_size]
+        )
+        if not rows:
+            return
+        for row in export_chunk(rows):
+            yield json.dumps(row, ensure_ascii=False) + '\n'
+        last_id = rows[-1]['id']
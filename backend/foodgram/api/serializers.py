@@ -1,23 +1,36 @@
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework.exceptions import ValidationError
 
+from api.fields import ImageSrcsetField
+from api.recipe_changes import (invalidate_recipes, refresh_pantry_index,
+                                touch_recipes)
+from recipe import cart_totals
+from recipe.image_variants import (AVATAR_WIDTHS, RECIPE_IMAGE_WIDTHS,
+                                   file_hash)
 from recipe.models import (User, Ingredient, Tag, Subscription, Recipe,
                            RecipeIngredient, Favorite, ShoppingCart)
 
 
 class UserSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
+    avatar_srcset = ImageSrcsetField(
+        AVATAR_WIDTHS, 'avatar_hash', 'avatar_width'
+    )
 
     class Meta:
         model = User
         fields = (
             'id', 'username', 'first_name',
-            'last_name', 'email', 'is_subscribed', 'avatar'
+            'last_name', 'email', 'is_subscribed', 'avatar', 'avatar_srcset'
         )
         read_only_fields = ['avatar']
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if (request
             and request.user.is_authenticated and Subscription.objects.filter(
@@ -62,10 +75,13 @@ class TagSerializer(serializers.ModelSerializer):
 
 class RecipesForSubscriptionSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    image_srcset = ImageSrcsetField(
+        RECIPE_IMAGE_WIDTHS, 'image_hash', 'image_width'
+    )
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_srcset', 'cooking_time')
 
     def get_image(self, obj):
         request = self.context.get('request')
@@ -90,26 +106,41 @@ class NewSubscribeSerializer(serializers.Serializer):
     def save(self, **kwargs):
         user = self.context.get('request').user
         follower = self.context.get('subscribe_to')
-        subscription = Subscription.objects.create(
+        self.instance = Subscription.objects.create(
             user=user,
             subsсribed_to=follower
         )
-        return subscription
+        return self.instance
 
     def to_representation(self, instance):
-        follower = self.context.get('subscribe_to')
-        user_data = UserSerializer(follower, context=self.context).data
-        recipes = follower.recipes.all()
-        param = self.context.get('request').query_params.get('recipes_limit')
-        if param is not None:
-            recipes = recipes[0:int(param)]
-        recipes = RecipesForSubscriptionSerializer(
-            recipes, many=True, context=self.context
+        subscription = Subscription.objects.with_author_data().get(
+            pk=instance.pk
+        )
+        return SubscriptionSerializer(
+            subscription,
+            context=self.context
         ).data
-        recipes_count = follower.recipes.count()
-        user_data['recipes'] = recipes
-        user_data['recipes_count'] = recipes_count
-        return user_data
+
+
+def prefetch_subscription_recipes(subscriptions, request):
+    authors = [subscription.subsсribed_to for subscription in subscriptions]
+    recipes = Recipe.objects.filter(author__in=authors)
+    param = request.query_params.get('recipes_limit')
+    if param is not None:
+        recipes = recipes.latest_per_author(int(param))
+    prefetch_related_objects(authors, Prefetch(
+        'recipes',
+        queryset=recipes.order_by('-id'),
+        to_attr='limited_recipes'
+    ))
+
+
+class SubscriptionListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        data = list(data)
+        prefetch_subscription_recipes(data, self.context.get('request'))
+        return super().to_representation(data)
 
 
 class SubscriptionSerializer(serializers.ModelSerializer):
@@ -120,27 +151,28 @@ class SubscriptionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Subscription
         fields = ('subsсribed_to',)
+        list_serializer_class = SubscriptionListSerializer
 
     def get_recipes(self, obj):
-        recipes = obj.subsсribed_to.recipes.all()
-        param = self.context.get('request').query_params.get('recipes_limit')
-        if param is not None:
-            recipes = recipes[0:int(param)]
-        recipes = RecipesForSubscriptionSerializer(
-            recipes,
+        if not hasattr(obj.subsсribed_to, 'limited_recipes'):
+            prefetch_subscription_recipes(
+                [obj], self.context.get('request')
+            )
+        return RecipesForSubscriptionSerializer(
+            obj.subsсribed_to.limited_recipes,
             many=True,
             context=self.context
         ).data
-        return recipes
 
     def get_recipes_count(self, obj):
-        return obj.subsсribed_to.recipes.count()
+        return obj.subsсribed_to.recipes_count
 
     def to_representation(self, obj):
-        user_data = UserSerializer(
-            obj.subsсribed_to,
-            context=self.context
-        ).data
+        author = obj.subsсribed_to
+        author.is_subscribed = (
+            obj.user_id == self.context.get('request').user.id
+        )
+        user_data = UserSerializer(author, context=self.context).data
         user_data['recipes'] = self.get_recipes(obj)
         user_data['recipes_count'] = self.get_recipes_count(obj)
         return user_data
@@ -163,9 +195,10 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount',)
 
 
-class ShowRecipeSerializer(serializers.ModelSerializer):
-    is_favorited = serializers.SerializerMethodField(read_only=True)
-    is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
+class RecipeSerializer(serializers.ModelSerializer):
+    image_srcset = ImageSrcsetField(
+        RECIPE_IMAGE_WIDTHS, 'image_hash', 'image_width'
+    )
     author = UserSerializer(read_only=True)
     tags = TagSerializer(read_only=True, many=True)
     ingredients = IngredientInRecipeSerializer(
@@ -177,21 +210,40 @@ class ShowRecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = (
-            'id', 'name', 'image', 'text', 'cooking_time', 'author', 'tags',
-            'ingredients', 'is_favorited', 'is_in_shopping_cart'
+            'id', 'name', 'image', 'image_srcset', 'text', 'cooking_time',
+            'author', 'tags', 'ingredients'
         )
 
-    def _is_user_related_to_object(self, obj, model):
+
+class ShowRecipeSerializer(RecipeSerializer):
+    is_favorited = serializers.SerializerMethodField(read_only=True)
+    is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + (
+            'is_favorited', 'is_in_shopping_cart', 'favorites_count'
+        )
+
+    def _is_user_related_to_object(self, obj, model, annotation):
+        if hasattr(obj, annotation):
+            return getattr(obj, annotation)
         user = self.context.get('request').user
         if user.is_authenticated:
             return model.objects.filter(recipe=obj, user=user).exists()
         return False
 
     def get_is_favorited(self, obj):
-        return self._is_user_related_to_object(obj, Favorite)
+        return self._is_user_related_to_object(obj, Favorite, 'is_favorited')
 
     def get_is_in_shopping_cart(self, obj):
-        return self._is_user_related_to_object(obj, ShoppingCart)
+        return self._is_user_related_to_object(
+            obj, ShoppingCart, 'is_in_shopping_cart'
+        )
+
+    def to_representation(self, instance):
+        if hasattr(instance, 'is_author_subscribed'):
+            instance.author.is_subscribed = instance.is_author_subscribed
+        return super().to_representation(instance)
 
 
 class NewRecipeSerializer(serializers.ModelSerializer):
@@ -211,26 +263,28 @@ class NewRecipeSerializer(serializers.ModelSerializer):
         tags = data.get('tags')
         ingredients = data.get('ingredients')
         image = data.get('image')
-        list_of_ingredient_names = []
-
-        for ingredient in ingredients:
-            list_of_ingredient_names.append(ingredient['ingredient'])
 
-        if ingredients is None:
-            raise ValidationError('В рецепте нет ингредиентов')
+        # При частичном обновлении не переданные теги и ингредиенты
+        # остаются прежними.
+        if ingredients is not None or not self.partial:
+            if not ingredients:
+                raise ValidationError('В рецепте нет ингредиентов')
+            list_of_ingredient_names = [
+                ingredient['ingredient'] for ingredient in ingredients
+            ]
+            if (len(list_of_ingredient_names)
+                    != len(set(list_of_ingredient_names))):
+                raise ValidationError('Есть одинаковые ингредиенты')
 
         if self.context.get('request').method == 'POST':
             if image is None:
                 raise ValidationError('Нет картинки')
 
-        if tags is None:
-            raise ValidationError('Нет тегов')
-
-        if len(tags) != len(set(tags)):
-            raise ValidationError('Есть одинаковые теги')
-
-        if len(list_of_ingredient_names) != len(set(list_of_ingredient_names)):
-            raise ValidationError('Есть одинаковые ингредиенты')
+        if tags is not None or not self.partial:
+            if not tags:
+                raise ValidationError('Нет тегов')
+            if len(tags) != len(set(tags)):
+                raise ValidationError('Есть одинаковые теги')
 
         return data
 
@@ -244,26 +298,99 @@ class NewRecipeSerializer(serializers.ModelSerializer):
                 amount=ingredient['amount']
             ))
         RecipeIngredient.objects.bulk_create(ingredients)
+        # bulk_create не отправляет сигналы.
+        refresh_pantry_index([instance.pk])
+
+    @staticmethod
+    def update_tags(instance, tags):
+        current = set(instance.tags.values_list('id', flat=True))
+        new = {tag.pk for tag in tags}
+        if current - new:
+            instance.tags.remove(*(current - new))
+        if new - current:
+            instance.tags.add(*(new - current))
+
+    @staticmethod
+    def update_ingredients(instance, ingredients_list):
+        """Меняет только добавленные, удалённые и изменённые строки."""
+        current = {
+            item.ingredient_id: item
+            for item in instance.ingredients_in_recipe.all()
+        }
+        new = {
+            ingredient['ingredient'].pk: ingredient['amount']
+            for ingredient in ingredients_list
+        }
+        removed = [current[pk].pk for pk in current.keys() - new.keys()]
+        changed = []
+        for pk, amount in new.items():
+            if pk in current and current[pk].amount != amount:
+                current[pk].amount = amount
+                changed.append(current[pk])
+        added = [
+            RecipeIngredient(recipe=instance, ingredient_id=pk, amount=amount)
+            for pk, amount in new.items() if pk not in current
+        ]
+        if removed:
+            RecipeIngredient.objects.filter(pk__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        if added:
+            RecipeIngredient.objects.bulk_create(added)
+        if changed or added:
+            # bulk_update и bulk_create не отправляют сигналы.
+            invalidate_recipes([instance.pk])
+            touch_recipes([instance.pk])
+            refresh_pantry_index([instance.pk])
+            cart_totals.refresh(
+                [instance.pk],
+                [item.ingredient_id for item in changed + added]
+            )
 
     def create(self, validated_data):
         ingredients_list = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         validated_data['author'] = self.context.get('request').user
 
-        recipe = Recipe.objects.create(
-            **validated_data
-        )
-        recipe.tags.set(tags)
-        self.create_ingredients(recipe, ingredients_list)
+        # Версия кеша сдвигается после коммита, когда теги и ингредиенты
+        # уже записаны: иначе чтение между запросами закеширует рецепт
+        # без них.
+        with transaction.atomic():
+            recipe = Recipe.objects.create(
+                **validated_data
+            )
+            recipe.tags.set(tags)
+            self.create_ingredients(recipe, ingredients_list)
         return recipe
 
     def update(self, instance, validated_data):
-        ingredients_list = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
-        super().update(instance, validated_data)
-        instance.ingredients.clear()
-        instance.tags.set(tags)
-        self.create_ingredients(instance, ingredients_list)
+        ingredients_list = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        image = validated_data.get('image')
+        if image is not None and file_hash(image) == instance.image_hash:
+            # Та же картинка: не сохраняем копию и не пересчитываем варианты.
+            del validated_data['image']
+        changed = [
+            field for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        ]
+        with transaction.atomic():
+            if tags is not None or ingredients_list is not None:
+                # Параллельные правки одного рецепта считают разницу
+                # по очереди.
+                list(Recipe.objects.select_for_update().filter(
+                    pk=instance.pk
+                ).values_list('pk'))
+            if changed:
+                for field in changed:
+                    setattr(instance, field, validated_data[field])
+                if 'image' in changed:
+                    changed += ['image_hash', 'image_width']
+                instance.save(update_fields=changed + ['updated_at'])
+            if tags is not None:
+                self.update_tags(instance, tags)
+            if ingredients_list is not None:
+                self.update_ingredients(instance, ingredients_list)
         return instance
 
     def to_representation(self, instance):
@@ -0,0 +1,60 @@
+import re
+from itertools import groupby
+from operator import itemgetter
+
+from recipe.models import CartTotal, ShoppingCart
+
+UNIT_SEPARATORS = re.compile(r'[\s.]+')
+
+
+def normalize_unit(unit):
+    return UNIT_SEPARATORS.sub('', unit.lower())
+
+
+def shopping_list_rows(user):
+    """Суммы ингредиентов корзины из готовых итогов CartTotal."""
+    return CartTotal.objects.filter(user=user).values_list(
+        'ingredient__name', 'ingredient__measurement_unit', 'total'
+    ).order_by(
+        'ingredient__name', 'ingredient__measurement_unit'
+    )
+
+
+def cart_summary(user):
+    """Число рецептов в корзине и суммы ингредиентов по ним."""
+    return {
+        'recipes_count': ShoppingCart.objects.filter(user=user).count(),
+        'ingredients': [
+            {
+                'id': pk,
+                'name': name,
+                'measurement_unit': unit,
+                'amount': total,
+            }
+            for pk, name, unit, total in CartTotal.objects.filter(
+                user=user
+            ).values_list(
+                'ingredient_id', 'ingredient__name',
+                'ingredient__measurement_unit', 'total'
+            ).order_by('ingredient__name', 'ingredient__measurement_unit')
+        ],
+    }
+
+
+def shopping_list_lines(user):
+    """Строки списка покупок: (название, количество, единица измерения).
+
+    Строки читаются итератором. Единицы, отличающиеся только написанием
+    ("шт"/"шт.", "ч. л."/"ч.л."), объединяются в одну строку.
+    """
+    rows = shopping_list_rows(user).iterator()
+    for name, group in groupby(rows, key=itemgetter(0)):
+        merged = {}
+        for _, unit, total in group:
+            key = normalize_unit(unit)
+            if key in merged:
+                merged[key][1] += total
+            else:
+                merged[key] = [unit, total]
+        for unit, total in merged.values():
+            yield name, total, unit
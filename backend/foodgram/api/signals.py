@@ -0,0 +1,97 @@
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import forget_token, forget_user_tokens
+from api.catalog_snapshots import (write_ingredient_snapshots,
+                                   write_tag_snapshot)
+from api.ingredient_index import ingredient_index
+from api.recipe_changes import (invalidate_recipes, refresh_pantry_index,
+                                touch_recipes)
+from api.tag_catalog import tag_catalog
+from recipe.models import Ingredient, Recipe, RecipeIngredient, Tag, User
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    invalidate_recipes([instance.pk])
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    invalidate_recipes([instance.recipe_id])
+    touch_recipes([instance.recipe_id])
+    refresh_pantry_index([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_relations_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if not reverse:
+        recipe_ids = [instance.pk] if action.startswith('post_') else []
+    elif action == 'pre_clear':
+        recipe_ids = list(instance.recipe_set.values_list('id', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        recipe_ids = list(pk_set)
+    else:
+        return
+    invalidate_recipes(recipe_ids)
+    touch_recipes(recipe_ids)
+    if sender is Recipe.ingredients.through:
+        refresh_pantry_index(recipe_ids)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def catalog_item_saved(sender, instance, created, **kwargs):
+    if not created:
+        recipe_ids = instance.recipe_set.values_list('id', flat=True)
+        invalidate_recipes(recipe_ids)
+        touch_recipes(recipe_ids)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def catalog_item_deleted(sender, instance, **kwargs):
+    recipe_ids = instance.recipe_set.values_list('id', flat=True)
+    invalidate_recipes(recipe_ids)
+    touch_recipes(recipe_ids)
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields, **kwargs):
+    if created or update_fields == frozenset(['last_login']):
+        return
+    recipe_ids = instance.recipes.values_list('id', flat=True)
+    invalidate_recipes(recipe_ids)
+    touch_recipes(recipe_ids)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_catalog_changed(sender, **kwargs):
+    transaction.on_commit(ingredient_index.invalidate)
+    transaction.on_commit(write_ingredient_snapshots)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_catalog_changed(sender, **kwargs):
+    transaction.on_commit(tag_catalog.invalidate)
+    transaction.on_commit(write_tag_snapshot)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    forget_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    if not created and update_fields != frozenset(['last_login']):
+        forget_user_tokens(instance)
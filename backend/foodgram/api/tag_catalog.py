@@ -0,0 +1,47 @@
+from api.catalog import ProcessCatalog
+from recipe.models import Tag
+
+
+class TagCatalog(ProcessCatalog):
+    """Все теги в памяти процесса: список и поиск по id и slug."""
+
+    version_key = 'tags:catalog:version'
+
+    def __init__(self):
+        super().__init__()
+        # Список и словари по id и slug заменяются одним присваиванием,
+        # чтобы читатель не увидел их вперемешку.
+        self._state = ([], {}, {})
+
+    def _rebuild(self):
+        items = [
+            {'id': pk, 'name': name, 'slug': slug}
+            for pk, name, slug in Tag.objects.order_by('id').values_list(
+                'id', 'name', 'slug'
+            )
+        ]
+        self._state = (
+            items,
+            {item['id']: item for item in items},
+            {item['slug']: item['id'] for item in items},
+        )
+
+    def all(self):
+        self._ensure_fresh()
+        return self._state[0]
+
+    def get(self, pk):
+        self._ensure_fresh()
+        return self._state[1].get(pk)
+
+    def ids_for_slugs(self, slugs):
+        self._ensure_fresh()
+        ids_by_slug = self._state[2]
+        return [ids_by_slug[slug] for slug in slugs if slug in ids_by_slug]
+
+
+tag_catalog = TagCatalog()
+
+
+def tag_choices():
+    return [(item['slug'], item['name']) for item in tag_catalog.all()]
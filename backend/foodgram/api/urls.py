@@ -1,6 +1,9 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from api import async_views
+from api.metrics import metrics_view
 from api.views import (UserViewSet, TagViewSet, IngredientViewSet,
                        SubscriptionViewSet, RecipeViewSet, url)
 
@@ -17,8 +20,18 @@ router.register('recipes', RecipeViewSet)
 
 
 urlpatterns = [
+    path('_metrics/', metrics_view),
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
     path('s/<str:short>/', url)
 ]
+
+# Асинхронные версии горячих эндпоинтов для запуска под ASGI-сервером.
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = [
+        path('tags/', async_views.tag_list),
+        path('ingredients/', async_views.ingredient_list),
+        path('recipes/<int:pk>/', async_views.recipe_detail),
+        path('s/<str:short>/', async_views.short_link),
+    ] + urlpatterns
@@ -1,3 +1,6 @@
+import time
+from functools import lru_cache
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -5,15 +8,30 @@ from django.shortcuts import get_object_or_404, redirect
 from djoser.views import UserViewSet
 from rest_framework.pagination import LimitOffsetPagination
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import HttpResponse
-from django.db.models import Sum
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
 
+from api.cache import get_recipes_data
+from api.conditional import conditional_response, recipe_validators
+from api.db_router import use_primary
+from api.ingredient_index import ingredient_index, search_limit
+from api.metrics import SerializationTimingMixin, serialization_timer
+from api.pantry_index import pantry_index
+from api.recipe_ndjson import RecipeImporter, export_lines
+from api.pagination import RecipePagination
 from api.permissions import IsAuthorOrReadOnly
-from api.filters import NameFilter, NameAuthorFilter
+from api.renderers import SHOPPING_LIST_RENDERERS
+from api.shopping_list import cart_summary, shopping_list_lines
+from api.tag_catalog import tag_catalog
+from api.filters import NameAuthorFilter
 from recipe.models import (User, Tag, Ingredient,
                            Subscription, Recipe, Favorite, ShoppingCart)
+from recipe.feed import feed_recipe_ids
+from recipe.short_links import decode_short_link
 from api.serializers import (UserSerializer, TagSerializer,
                              IngredientSerializer,
                              PutAvatarSerializer, NewSubscribeSerializer,
@@ -21,8 +39,13 @@ from api.serializers import (UserSerializer, TagSerializer,
                              NewRecipeSerializer,
                              FavoriteSerializer, CartSerializer)
 
+MATCH_DEFAULT_LIMIT = 10
+MATCH_MAX_LIMIT = 100
+FEED_DEFAULT_LIMIT = 10
+FEED_MAX_LIMIT = 100
+
 
-class UserViewSet(UserViewSet):
+class UserViewSet(SerializationTimingMixin, UserViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     pagination_class = LimitOffsetPagination
@@ -77,41 +100,89 @@ class UserViewSet(UserViewSet):
         )
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(SerializationTimingMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     pagination_class = None
     serializer_class = TagSerializer
 
+    def list(self, request, *args, **kwargs):
+        return conditional_response(
+            request,
+            tag_catalog.validators(),
+            lambda: Response(tag_catalog.all())
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return conditional_response(
+            request,
+            tag_catalog.validators(),
+            lambda: self.respond_tag(kwargs['pk'])
+        )
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+    @staticmethod
+    def respond_tag(pk):
+        tag = tag_catalog.get(int(pk)) if pk.isdigit() else None
+        if tag is None:
+            raise Http404
+        return Response(tag)
+
+
+class IngredientViewSet(SerializationTimingMixin,
+                        viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     pagination_class = None
     serializer_class = IngredientSerializer
-    filter_backends = [
-        DjangoFilterBackend,
-    ]
-    filterset_class = NameFilter
 
+    def list(self, request, *args, **kwargs):
+        limit = request.query_params.get('limit', '')
+        return conditional_response(
+            request,
+            ingredient_index.validators(),
+            lambda: Response(ingredient_index.search(
+                request.query_params.get('name', ''),
+                search_limit(limit)
+            ))
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return conditional_response(
+            request,
+            ingredient_index.validators(),
+            lambda: self.respond_ingredient(kwargs['pk'])
+        )
 
-class SubscriptionViewSet(viewsets.ModelViewSet):
+    @staticmethod
+    def respond_ingredient(pk):
+        ingredient = ingredient_index.get(int(pk)) if pk.isdigit() else None
+        if ingredient is None:
+            raise Http404
+        return Response(ingredient)
+
+
+class SubscriptionViewSet(SerializationTimingMixin, viewsets.ModelViewSet):
     serializer_class = SubscriptionSerializer
     pagination_class = LimitOffsetPagination
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Subscription.objects.filter(user=self.request.user)
+        return Subscription.objects.filter(
+            user=self.request.user
+        ).with_author_data().order_by('id')
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all().order_by('-id')
-    pagination_class = PageNumberPagination
+class RecipeViewSet(SerializationTimingMixin, viewsets.ModelViewSet):
+    queryset = Recipe.objects.all()
+    pagination_class = RecipePagination
     filter_backends = [
         DjangoFilterBackend,
     ]
     filterset_class = NameAuthorFilter
     permission_classes = [IsAuthorOrReadOnly]
 
+    # Строка избранного или корзины и итоги корзины пишутся вместе.
     @staticmethod
+    @use_primary()
+    @transaction.atomic
     def custom_action(request, model, model_serializer, pk):
         if request.method == 'POST':
             recipe = get_object_or_404(Recipe, pk=pk)
@@ -132,6 +203,45 @@ class RecipeViewSet(viewsets.ModelViewSet):
         obj.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    # Итоги корзин пересчитываются в той же транзакции, что и рецепт.
+    @transaction.atomic
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.with_user_flags(self.request.user)
+        return queryset.order_by('-id')
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        with serialization_timer():
+            data = get_recipes_data(
+                list(queryset) if page is None else page, request
+            )
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        return conditional_response(
+            request,
+            recipe_validators(instance, request.user),
+            lambda: self.respond_recipe(instance, request)
+        )
+
+    @staticmethod
+    def respond_recipe(instance, request):
+        with serialization_timer():
+            return Response(get_recipes_data([instance], request)[0])
+
     def get_serializer_class(self):
         if self.action in ('create', 'partial_update',):
             return NewRecipeSerializer
@@ -158,21 +268,138 @@ class RecipeViewSet(viewsets.ModelViewSet):
         methods=['get'],
         detail=False,
         url_path='download_shopping_cart',
-        permission_classes=(IsAuthenticated,)
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=SHOPPING_LIST_RENDERERS
     )
     def download(self, request, pk=None):
-        ingredients = Ingredient.objects.filter(
-            recipe_ingredient__recipe__carts__user=request.user
-        ).annotate(
-            total=Sum('recipe_ingredient__amount'))
-        response = HttpResponse(content_type='text/plain')
-        response['Content-Disposition'] = ('attachment; filename'
-                                           '="list_of_ingredients.txt"')
-        for ingredient in ingredients:
-            response.write(
-                (f"{ingredient.name}, кол-во"
-                 f" {ingredient.total} {ingredient.measurement_unit}\n")
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(shopping_list_lines(request.user)),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename='
+            f'"list_of_ingredients.{renderer.format}"'
+        )
+        return response
+
+    @action(
+        methods=['get'],
+        detail=False,
+        url_path='shopping_cart_summary',
+        permission_classes=(IsAuthenticated,)
+    )
+    def shopping_cart_summary(self, request):
+        return Response(cart_summary(request.user))
+
+    @action(methods=['get'], detail=False, url_path='match')
+    def match(self, request):
+        ingredient_ids = [
+            value
+            for param in request.query_params.getlist('ingredients')
+            for value in param.split(',') if value
+        ]
+        if not ingredient_ids:
+            raise ValidationError({'ingredients': 'Не указаны ингредиенты'})
+        if not all(value.isdigit() for value in ingredient_ids):
+            raise ValidationError({'ingredients': 'Ожидаются id ингредиентов'})
+        limit = request.query_params.get('limit', '')
+        limit = min(
+            int(limit) if limit.isdigit() else MATCH_DEFAULT_LIMIT,
+            MATCH_MAX_LIMIT
+        )
+        matches = pantry_index.match(map(int, ingredient_ids), limit)
+        recipes = Recipe.objects.with_user_flags(request.user).in_bulk(
+            [recipe_id for recipe_id, _, _ in matches]
+        )
+        matches = [match for match in matches if match[0] in recipes]
+        with serialization_timer():
+            data = get_recipes_data(
+                [recipes[recipe_id] for recipe_id, _, _ in matches], request
+            )
+            for item, (_, coverage, missing) in zip(data, matches):
+                item['coverage'] = round(coverage, 4)
+                item['missing_ingredients'] = [
+                    ingredient_index.get(ingredient_id)
+                    for ingredient_id in missing
+                ]
+        return Response(data)
+
+    @action(
+        methods=['get'],
+        detail=False,
+        url_path='feed',
+        permission_classes=(IsAuthenticated,)
+    )
+    def feed(self, request):
+        """Рецепты авторов из подписок, от новых к старым.
+
+        Листается по ключу: ссылка next содержит before=<id последнего>.
+        """
+        before = request.query_params.get('before', '')
+        limit = request.query_params.get('limit', '')
+        limit = min(
+            int(limit) if limit.isdigit() and int(limit) > 0
+            else FEED_DEFAULT_LIMIT,
+            FEED_MAX_LIMIT
+        )
+        recipe_ids = feed_recipe_ids(
+            request.user, int(before) if before.isdigit() else None, limit
+        )
+        recipes = Recipe.objects.with_user_flags(request.user).in_bulk(
+            recipe_ids
+        )
+        with serialization_timer():
+            results = get_recipes_data(
+                [recipes[pk] for pk in recipe_ids if pk in recipes], request
             )
+        next_link = None
+        if len(recipe_ids) == limit:
+            next_link = replace_query_param(
+                request.build_absolute_uri(), 'before', recipe_ids[-1]
+            )
+        return Response({'next': next_link, 'results': results})
+
+    @action(
+        methods=['post'],
+        detail=False,
+        url_path='import',
+        permission_classes=(IsAuthenticated,)
+    )
+    def import_recipes(self, request):
+        started = time.perf_counter()
+        importer = RecipeImporter(request.user).run(request.stream or [])
+        seconds = time.perf_counter() - started
+        return Response(
+            {
+                'created': importer.created,
+                'errors': importer.errors,
+                'seconds': round(seconds, 3),
+            },
+            status=(
+                status.HTTP_201_CREATED if importer.created
+                else status.HTTP_400_BAD_REQUEST
+            )
+        )
+
+    @action(
+        methods=['get'],
+        detail=False,
+        url_path='export',
+        permission_classes=(IsAuthenticated,)
+    )
+    def export_recipes(self, request):
+        queryset = Recipe.objects.all()
+        author = request.query_params.get('author', '')
+        if author.isdigit():
+            queryset = queryset.filter(author_id=author)
+        response = StreamingHttpResponse(
+            export_lines(queryset),
+            content_type='application/x-ndjson; charset=utf-8'
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename="recipes.ndjson"'
+        )
         return response
 
     @action(methods=['get'], detail=True, url_path='get-link')
@@ -182,6 +409,22 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response({'short-link': link})
 
 
+@lru_cache(maxsize=settings.SHORT_LINK_CACHE_SIZE)
+def resolve_short_link(short):
+    # Раскодированный id сверяется с сохранённым у рецепта кодом: ссылка,
+    # выданная с другим ключом, не должна вести на чужой рецепт.
+    recipe_id = decode_short_link(short)
+    if recipe_id is not None and Recipe.objects.filter(
+        pk=recipe_id, short=short
+    ).exists():
+        return recipe_id
+    return Recipe.objects.filter(
+        short=short
+    ).values_list('id', flat=True).first()
+
+
 def url(request, short):
-    recipe = get_object_or_404(Recipe, short=short)
-    return redirect(f'/recipes/{recipe.id}')
+    recipe_id = resolve_short_link(short)
+    if recipe_id is None:
+        raise Http404
+    return redirect(f'/recipes/{recipe_id}')
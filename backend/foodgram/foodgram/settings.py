@@ -32,6 +32,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
+    'api.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -72,6 +74,106 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения: DB_REPLICA_HOSTS=хост[:порт],хост[:порт].
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+        filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), 1):
+    host, _, port = replica.strip().partition(':')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['api.db_router.ReplicaRouter']
+
+# Сколько секунд после записи клиент читает с основной базы. Привязка по
+# токену работает между процессами только с общим кешем (CACHE_BACKEND).
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 5))
+
+CACHE_BACKEND = os.getenv(
+    'CACHE_BACKEND',
+    'django.core.cache.backends.locmem.LocMemCache'
+)
+
+RECIPE_CACHE_TIMEOUT = int(os.getenv('RECIPE_CACHE_TIMEOUT', 60 * 60))
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    },
+    'tokens': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv('CACHE_LOCATION', 'tokens'),
+        'KEY_PREFIX': 'auth',
+        'TIMEOUT': int(os.getenv('TOKEN_CACHE_TIMEOUT', 5 * 60)),
+    },
+    # Данные рецептов держатся отдельно, чтобы не вытеснять служебные
+    # ключи (липкость к основной базе, метрики) из кеша по умолчанию.
+    'recipes': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv(
+            'RECIPE_CACHE_LOCATION', os.getenv('CACHE_LOCATION', 'recipes')
+        ),
+        'KEY_PREFIX': 'recipes',
+        'TIMEOUT': RECIPE_CACHE_TIMEOUT,
+    },
+}
+
+# Локальный кеш вытесняет давно использованные записи сверх MAX_ENTRIES.
+if CACHE_BACKEND.endswith('LocMemCache'):
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('CACHE_SIZE', 10000)),
+    }
+    CACHES['tokens']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('TOKEN_CACHE_SIZE', 10000)),
+    }
+    CACHES['recipes']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('RECIPE_CACHE_SIZE', 10000)),
+    }
+
+# Как часто процесс сверяет версии справочников (теги, ингредиенты)
+# с базой, в секундах.
+CATALOG_VERSION_CHECK_INTERVAL = float(
+    os.getenv('CATALOG_VERSION_CHECK_INTERVAL', 1)
+)
+
+# Ключ, которым кодируются короткие ссылки на рецепты. Он не зависит от
+# SECRET_KEY и не должен меняться никогда: после смены ключа все выданные
+# ссылки начнут вести на другие рецепты. Без него приложение не запустится.
+SHORT_LINK_SECRET = os.getenv('SHORT_LINK_SECRET', '')
+
+SHORT_LINK_CACHE_SIZE = int(os.getenv('SHORT_LINK_CACHE_SIZE', 10000))
+
+SLOW_QUERY_THRESHOLD_MS = (
+    float(os.getenv('SLOW_QUERY_THRESHOLD_MS'))
+    if os.getenv('SLOW_QUERY_THRESHOLD_MS') else None
+)
+
+# Токен для /api/_metrics/ (Authorization: Bearer <токен>). Пока он не
+# задан, метрики никому не отдаются.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', default='False') == 'True'
+
+# Рецепты авторов с большим числом подписчиков не раскладываются по лентам
+# при публикации, а подмешиваются при чтении.
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', 10000))
+
+FEED_BACKFILL_SIZE = int(os.getenv('FEED_BACKFILL_SIZE', 50))
+
+# Каталог для снимков /api/tags/ и /api/ingredients/, которые отдаёт nginx
+# (infra/nginx.conf). Пустое значение отключает снимки.
+CATALOG_SNAPSHOT_ROOT = os.getenv('CATALOG_SNAPSHOT_ROOT', '')
+
+# Шарды ?name= пишутся для префиксов не длиннее этого.
+CATALOG_SNAPSHOT_PREFIX_LENGTH = int(
+    os.getenv('CATALOG_SNAPSHOT_PREFIX_LENGTH', 3)
+)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -89,12 +191,16 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
 }
 
+RECIPE_CURSOR_PAGINATION = (
+    os.getenv('RECIPE_CURSOR_PAGINATION', default='False') == 'True'
+)
+
 DJOSER = {
     'SERIALIZERS': {
         'user': 'api.serializers.UserSerializer',
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 
 
 class RecipeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipe'
+
+    def ready(self):
+        if not settings.SHORT_LINK_SECRET:
+            raise ImproperlyConfigured(
+                'Не задан SHORT_LINK_SECRET: без него короткие ссылки '
+                'на рецепты нельзя ни выдать, ни раскодировать.'
+            )
+        import recipe.signals  # noqa: F401
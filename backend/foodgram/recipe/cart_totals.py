@@ -0,0 +1,120 @@
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+from recipe.models import CartTotal, RecipeIngredient, ShoppingCart
+
+
+def change_totals(user_id, recipe_id, sign):
+    """Прибавляет (sign=1) или вычитает (sign=-1) рецепт из итогов корзины.
+
+    Строки создаются пустыми и меняются одним UPDATE, так что
+    одновременные изменения не теряются.
+    """
+    amounts = dict(RecipeIngredient.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('ingredient_id', 'amount'))
+    if not amounts:
+        return
+    cells = CartTotal.objects.filter(
+        user_id=user_id, ingredient_id__in=amounts
+    )
+    if sign > 0:
+        CartTotal.objects.bulk_create(
+            [
+                CartTotal(user_id=user_id, ingredient_id=pk, total=0)
+                for pk in amounts
+            ],
+            ignore_conflicts=True
+        )
+    delta = Case(
+        *(
+            When(ingredient_id=pk, then=Value(sign * amount))
+            for pk, amount in amounts.items()
+        ),
+        default=Value(0)
+    )
+    cells.update(total=Greatest(F('total') + delta, 0))
+    if sign < 0:
+        cells.filter(total=0).delete()
+
+
+def add_recipe(user_id, recipe_id):
+    change_totals(user_id, recipe_id, 1)
+
+
+def remove_recipe(user_id, recipe_id):
+    change_totals(user_id, recipe_id, -1)
+
+
+def refresh(recipe_ids, ingredient_ids):
+    """Пересчитывает итоги ингредиентов у корзин с этими рецептами.
+
+    Старое количество при изменении состава рецепта неизвестно, поэтому
+    затронутые строки считаются заново по корзинам. Как и в
+    change_totals, недостающие строки вставляются с ignore_conflicts,
+    а значения меняются одним UPDATE: параллельная вставка той же строки
+    не приводит к ошибке.
+    """
+    user_ids = ShoppingCart.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values('user_id')
+    CartTotal.objects.bulk_create(
+        (
+            CartTotal(user_id=user_id, ingredient_id=ingredient_id, total=0)
+            for user_id, ingredient_id, _ in totals(
+                ShoppingCart.objects.filter(
+                    user_id__in=user_ids,
+                    recipe__ingredients_in_recipe__ingredient_id__in=(
+                        ingredient_ids
+                    )
+                )
+            )
+        ),
+        ignore_conflicts=True
+    )
+    cells = CartTotal.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=ingredient_ids
+    )
+    cells.update(total=Coalesce(
+        Subquery(
+            RecipeIngredient.objects.filter(
+                ingredient_id=OuterRef('ingredient_id'),
+                recipe__carts__user_id=OuterRef('user_id')
+            ).order_by().values('ingredient_id').annotate(
+                total=Sum('amount')
+            ).values('total')
+        ),
+        Value(0)
+    ))
+    cells.filter(total=0).delete()
+
+
+def totals(carts):
+    """(пользователь, ингредиент, сумма) по строкам корзин."""
+    return carts.values_list(
+        'user_id', 'recipe__ingredients_in_recipe__ingredient_id'
+    ).annotate(
+        total=Sum('recipe__ingredients_in_recipe__amount')
+    ).order_by()
+
+
+def rebuild_cart_totals(get_model, batch_size=5000):
+    """Заполняет итоги корзин заново, возвращает число строк."""
+    cart_total = get_model('recipe', 'CartTotal')
+    cart_total.objects.all().delete()
+    created = 0
+    batch = []
+    for user_id, ingredient_id, total in totals(
+        get_model('recipe', 'ShoppingCart').objects.filter(
+            recipe__ingredients_in_recipe__isnull=False
+        )
+    ).iterator(chunk_size=batch_size):
+        batch.append(cart_total(
+            user_id=user_id, ingredient_id=ingredient_id, total=total
+        ))
+        if len(batch) >= batch_size:
+            cart_total.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    cart_total.objects.bulk_create(batch)
+    return created + len(batch)
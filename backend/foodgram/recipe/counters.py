@@ -0,0 +1,48 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# Счётчик: модель, поле и модель связи с внешним ключом на эту модель.
+COUNTERS = (
+    ('User', 'recipes_count', 'Recipe', 'author'),
+    ('User', 'subscribers_count', 'Subscription', 'subsсribed_to'),
+    ('Recipe', 'favorites_count', 'Favorite', 'recipe'),
+)
+
+
+def change_counter(model, pk, field, delta, **values):
+    """Атомарно меняет счётчик в базе, не опускаясь ниже нуля.
+
+    values записываются тем же UPDATE.
+    """
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta}, **values)
+
+
+def actual_count(related_model, related_field):
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(
+                **{related_field: OuterRef('pk')}
+            ).order_by().values(related_field).annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        0
+    )
+
+
+def rebuild_counters(get_model):
+    """Пересчитывает разошедшиеся счётчики, возвращает число исправлений."""
+    fixed = {}
+    for model_name, field, related_name, related_field in COUNTERS:
+        model = get_model('recipe', model_name)
+        actual = actual_count(get_model('recipe', related_name), related_field)
+        drifted = model.objects.annotate(actual=actual).exclude(
+            **{field: F('actual')}
+        ).values('pk')
+        fixed[f'{model_name}.{field}'] = model.objects.filter(
+            pk__in=drifted
+        ).update(**{field: actual})
+    return fixed
@@ -0,0 +1,121 @@
+from django.conf import settings
+
+from recipe.models import FeedItem, Recipe, Subscription, User
+
+FANOUT_BATCH_SIZE = 1000
+
+
+def fans_out(author_id):
+    """Раскладываются ли рецепты автора по лентам при публикации."""
+    subscribers_count = User.objects.filter(pk=author_id).values_list(
+        'subscribers_count', flat=True
+    ).first()
+    return (
+        subscribers_count is not None
+        and subscribers_count <= settings.FEED_FANOUT_LIMIT
+    )
+
+
+def fan_out(author_id, recipe_ids):
+    """Добавляет новые рецепты автора в ленты подписчиков пачками."""
+    if not recipe_ids or not fans_out(author_id):
+        return
+    subscriber_ids = Subscription.objects.filter(
+        subsсribed_to_id=author_id
+    ).values_list('user_id', flat=True)
+    batch = []
+    for user_id in subscriber_ids.iterator(chunk_size=FANOUT_BATCH_SIZE):
+        batch.extend(
+            FeedItem(user_id=user_id, author_id=author_id, recipe_id=pk)
+            for pk in recipe_ids
+        )
+        if len(batch) >= FANOUT_BATCH_SIZE:
+            FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def backfill(user_id, author_id):
+    """Новая подписка: последние рецепты автора сразу попадают в ленту."""
+    if not fans_out(author_id):
+        return
+    FeedItem.objects.bulk_create(
+        [
+            FeedItem(user_id=user_id, author_id=author_id, recipe_id=pk)
+            for pk in Recipe.objects.filter(
+                author_id=author_id
+            ).order_by('-id').values_list(
+                'id', flat=True
+            )[:settings.FEED_BACKFILL_SIZE]
+        ],
+        ignore_conflicts=True
+    )
+
+
+def forget(user_id, author_id):
+    FeedItem.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def feed_recipe_ids(user, before=None, limit=10):
+    """id рецептов ленты по убыванию, меньшие before.
+
+    Записи ленты дополняются рецептами авторов, для которых раскладка
+    при публикации не делается (больше FEED_FANOUT_LIMIT подписчиков).
+    """
+    items = FeedItem.objects.filter(user=user)
+    pulled_authors = list(Subscription.objects.filter(
+        user=user,
+        subsсribed_to__subscribers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).values_list('subsсribed_to_id', flat=True))
+    if before is not None:
+        items = items.filter(recipe_id__lt=before)
+    recipe_ids = set(
+        items.order_by('-recipe_id').values_list(
+            'recipe_id', flat=True
+        )[:limit]
+    )
+    if pulled_authors:
+        pulled = Recipe.objects.filter(author_id__in=pulled_authors)
+        if before is not None:
+            pulled = pulled.filter(pk__lt=before)
+        recipe_ids.update(
+            pulled.order_by('-id').values_list('id', flat=True)[:limit]
+        )
+    return sorted(recipe_ids, reverse=True)[:limit]
+
+
+def rebuild_feed(get_model, batch_size=5000):
+    """Заполняет ленты заново последними рецептами авторов подписок.
+
+    Возвращает число записей.
+    """
+    feed_item = get_model('recipe', 'FeedItem')
+    recipe = get_model('recipe', 'Recipe')
+    subscription = get_model('recipe', 'Subscription')
+    limit = settings.FEED_FANOUT_LIMIT
+    feed_item.objects.all().delete()
+    recent = {}
+    for author_id, recipe_id in recipe.objects.filter(
+        author__subscribers_count__gt=0,
+        author__subscribers_count__lte=limit
+    ).order_by('author_id', '-id').values_list(
+        'author_id', 'id'
+    ).iterator(chunk_size=batch_size):
+        ids = recent.setdefault(author_id, [])
+        if len(ids) < settings.FEED_BACKFILL_SIZE:
+            ids.append(recipe_id)
+    created = 0
+    batch = []
+    for user_id, author_id in subscription.objects.values_list(
+        'user_id', 'subsсribed_to_id'
+    ).iterator(chunk_size=batch_size):
+        batch.extend(
+            feed_item(user_id=user_id, author_id=author_id, recipe_id=pk)
+            for pk in recent.get(author_id, ())
+        )
+        if len(batch) >= batch_size:
+            feed_item.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    feed_item.objects.bulk_create(batch)
+    return created + len(batch)
@@ -0,0 +1,84 @@
+import hashlib
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+RECIPE_IMAGE_WIDTHS = (240, 480, 1200)
+AVATAR_WIDTHS = (64, 128, 256)
+VARIANT_FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {
+        'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True
+    },
+}
+VARIANT_PATH = 'variants/{}/{}.{}'
+EXIF_ORIENTATION = 0x0112
+# Повороты на 90 и 270 градусов меняют ширину и высоту местами.
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+def variant_path(content_hash, width, extension):
+    return VARIANT_PATH.format(content_hash, width, extension)
+
+
+def variant_widths(widths, source_width):
+    """Ширины сохранённых копий: копии не шире исходного изображения.
+
+    Ширины не меньше исходной заменяются одной копией в исходную ширину.
+    """
+    return sorted({min(width, source_width) for width in widths})
+
+
+def source_width(image):
+    """Ширина изображения после поворота по EXIF."""
+    width, height = image.size
+    if image.getexif().get(EXIF_ORIENTATION) in TRANSPOSED_ORIENTATIONS:
+        return height
+    return width
+
+
+def file_hash(file):
+    """sha256 содержимого файла; позиция чтения возвращается в начало."""
+    file.open('rb')
+    content_hash = hashlib.sha256(file.read()).hexdigest()
+    file.seek(0)
+    return content_hash
+
+
+def create_image_variants(field_file, widths):
+    """Сохраняет уменьшенные копии изображения в WebP и JPEG.
+
+    Копии лежат по пути от sha256 содержимого, поэтому одинаковые файлы
+    обрабатываются один раз. Метаданные (EXIF и пр.) в копии не попадают.
+    Изображение не увеличивается: ширины копий даёт variant_widths().
+    Возвращает хеш содержимого и ширину исходного изображения.
+    """
+    field_file.open('rb')
+    content = field_file.read()
+    field_file.seek(0)
+    content_hash = hashlib.sha256(content).hexdigest()
+    with Image.open(BytesIO(content)) as original:
+        original_width = source_width(original)
+        widths = variant_widths(widths, original_width)
+        paths = {
+            (width, extension): variant_path(content_hash, width, extension)
+            for width in widths for extension in VARIANT_FORMATS
+        }
+        if all(default_storage.exists(path) for path in paths.values()):
+            return content_hash, original_width
+        image = ImageOps.exif_transpose(original).convert('RGBA')
+    flat = Image.new('RGB', image.size, 'white')
+    flat.paste(image, mask=image.getchannel('A'))
+    for variant_width in widths:
+        variant = flat.copy()
+        variant.thumbnail((variant_width, flat.height), Image.LANCZOS)
+        for extension, options in VARIANT_FORMATS.items():
+            path = paths[(variant_width, extension)]
+            if default_storage.exists(path):
+                continue
+            buffer = BytesIO()
+            variant.save(buffer, **options)
+            default_storage.save(path, ContentFile(buffer.getvalue()))
+    return content_hash, original_width
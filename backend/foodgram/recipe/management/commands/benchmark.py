@@ -0,0 +1,250 @@
+import json
+import math
+import os
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.pagination import Cursor
+from rest_framework.test import APIClient
+
+from api.ingredient_index import ingredient_index
+from api.pagination import RecipeCursorPagination, RecipePagination
+from recipe.management.commands.index_advisor import (PlanChecker,
+                                                      hot_queries)
+from recipe.management.commands.seed_benchmark import benchmark_user
+from recipe.models import Ingredient, Recipe, Subscription, Tag
+
+BASELINE_PATH = 'benchmark_baseline.json'
+INGREDIENT_PREFIX = 'мук'
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = max(0, math.ceil(percent / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def scenarios(user):
+    """Сценарии: имя, путь и нужна ли авторизация."""
+    recipe = Recipe.objects.filter(author=user).order_by('-id').first()
+    author = Subscription.objects.filter(
+        user=user
+    ).values_list('subsсribed_to', flat=True).first() or user.id
+    tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+    tag_query = '&'.join(f'tags={slug}' for slug in tags)
+    pantry = ','.join(
+        str(pk) for pk in recipe.ingredients.values_list('id', flat=True)
+    )
+    # Последняя страница: самый большой OFFSET при любом объёме данных.
+    last_page = max(
+        1, math.ceil(Recipe.objects.count() / RecipePagination.page_size)
+    )
+    return [
+        ('recipes', '/api/recipes/', False),
+        ('recipes_auth', '/api/recipes/', True),
+        ('recipes_author', f'/api/recipes/?author={author}', False),
+        ('recipes_tags', f'/api/recipes/?{tag_query}', False),
+        ('recipes_favorited', '/api/recipes/?is_favorited=1', True),
+        ('recipes_cart', '/api/recipes/?is_in_shopping_cart=1', True),
+        ('recipes_search', '/api/recipes/?search=рецепт 42', False),
+        ('recipes_search_broad', '/api/recipes/?search=рецепт', False),
+        ('recipes_deep_page', f'/api/recipes/?page={last_page}', False),
+        ('feed', '/api/recipes/feed/', True),
+        ('recipe_detail', f'/api/recipes/{recipe.id}/', True),
+        ('subscriptions', '/api/users/subscriptions/?recipes_limit=3', True),
+        ('download', '/api/recipes/download_shopping_cart/', True),
+        (
+            'cart_summary', '/api/recipes/shopping_cart_summary/', True
+        ),
+        ('recipe_match', f'/api/recipes/match/?ingredients={pantry}', False),
+        (
+            'ingredient_search',
+            f'/api/ingredients/?name={INGREDIENT_PREFIX}',
+            False
+        ),
+        ('short_link', f'/api/s/{recipe.short}/', False),
+    ]
+
+
+def cursor_scenarios():
+    """Сценарии курсорной выдачи (RECIPE_CURSOR_PAGINATION=True).
+
+    Глубокий курсор указывает на последнюю страницу, как
+    recipes_deep_page для постраничной выдачи.
+    """
+    page = RecipePagination.page_size
+    position = Recipe.objects.order_by('id').values_list(
+        'id', flat=True
+    )[page:page + 1].first()
+    paginator = RecipeCursorPagination()
+    paginator.base_url = '/api/recipes/'
+    deep = paginator.encode_cursor(Cursor(
+        offset=0, reverse=False, position=position and str(position)
+    ))
+    return [
+        ('recipes_cursor_first', '/api/recipes/', False),
+        ('recipes_cursor_deep', deep, False),
+    ]
+
+
+def call_scenarios():
+    """Сценарии без HTTP: имя и функция.
+
+    Поиск ингредиентов по индексу в памяти сравнивается с тем же
+    запросом через ORM, которым раньше отвечал /api/ingredients/.
+    """
+    return [
+        (
+            'ingredient_index',
+            lambda: ingredient_index.search(INGREDIENT_PREFIX)
+        ),
+        (
+            'ingredient_orm',
+            lambda: list(Ingredient.objects.filter(
+                name__startswith=INGREDIENT_PREFIX
+            ).values('id', 'name', 'measurement_unit'))
+        ),
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержки и число запросов основных эндпоинтов '
+            'и сравнивает с базовой линией')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--baseline', default=BASELINE_PATH)
+        parser.add_argument(
+            '--save-baseline',
+            action='store_true',
+            help='Записать результаты как новую базовую линию'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.25,
+            help='Допустимый рост p95 относительно базовой линии'
+        )
+        parser.add_argument(
+            '--min-delta',
+            type=float,
+            default=2.0,
+            help='Рост p95 меньше этого числа мс не считается регрессией'
+        )
+        parser.add_argument('--only', nargs='*', help='Имена сценариев')
+        parser.add_argument(
+            '--skip-plans',
+            action='store_true',
+            help='Не проверять планы запросов (см. index_advisor)'
+        )
+
+    def handle(self, *args, **options):
+        user = benchmark_user()
+        if user is None:
+            raise CommandError('Нет данных, запустите seed_benchmark')
+        token = Token.objects.get_or_create(user=user)[0]
+        anonymous = APIClient()
+        authenticated = APIClient()
+        authenticated.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        calls = [
+            (name, self.request(authenticated if auth else anonymous, path))
+            for name, path, auth in scenarios(user)
+        ] + [
+            (
+                name,
+                self.request(
+                    authenticated if auth else anonymous, path,
+                    RECIPE_CURSOR_PAGINATION=True
+                )
+            )
+            for name, path, auth in cursor_scenarios()
+        ] + call_scenarios()
+        results = {}
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for name, call in calls:
+                if options['only'] and name not in options['only']:
+                    continue
+                results[name] = self.measure(call, options['iterations'])
+                self.stdout.write(
+                    '{:<20} p50 {p50:8.2f} ms  p95 {p95:8.2f} ms  '
+                    'p99 {p99:8.2f} ms  {queries} queries'.format(
+                        name, **results[name]
+                    )
+                )
+        regressions = [] if options['skip_plans'] else self.check_plans(user)
+        if options['save_baseline']:
+            with open(options['baseline'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+            self.stdout.write(
+                f'Базовая линия записана в {options["baseline"]}'
+            )
+        elif os.path.exists(options['baseline']):
+            regressions += self.compare(results, options)
+        if regressions:
+            raise CommandError('Регрессии:\n' + '\n'.join(regressions))
+        self.stdout.write('Регрессий нет')
+
+    def check_plans(self, user):
+        problems = [
+            f'{name}: план: {problem}'
+            for name, _, _, found, _ in PlanChecker().check(hot_queries(user))
+            for problem in found
+        ]
+        self.stdout.write(f'Планы запросов: проблем {len(problems)}')
+        return problems
+
+    @staticmethod
+    def request(client, path, **overrides):
+        def call():
+            with override_settings(**overrides):
+                response = client.get(path)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            if response.status_code >= 400:
+                raise CommandError(f'{path}: {response.status_code}')
+        return call
+
+    def measure(self, call, iterations):
+        call()
+        timings = []
+        queries = 0
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                call()
+                timings.append((time.perf_counter() - started) * 1000)
+            queries = max(queries, len(context.captured_queries))
+        return {
+            'p50': percentile(timings, 50),
+            'p95': percentile(timings, 95),
+            'p99': percentile(timings, 99),
+            'queries': queries,
+        }
+
+    def compare(self, results, options):
+        with open(options['baseline'], encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = []
+        for name, result in results.items():
+            expected = baseline.get(name)
+            if expected is None:
+                continue
+            limit = max(
+                expected['p95'] * (1 + options['threshold']),
+                expected['p95'] + options['min_delta']
+            )
+            if result['p95'] > limit:
+                regressions.append(
+                    f'{name}: p95 {result["p95"]:.2f} ms, '
+                    f'было {expected["p95"]:.2f} ms'
+                )
+            if result['queries'] > expected['queries']:
+                regressions.append(
+                    f'{name}: {result["queries"]} запросов, '
+                    f'было {expected["queries"]}'
+                )
+        return regressions
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from api.catalog_snapshots import write_catalog_snapshots
+
+
+class Command(BaseCommand):
+    help = ('Пишет снимки тегов и ингредиентов (с gzip и brotli), '
+            'которые nginx отдаёт без Django')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=settings.CATALOG_SNAPSHOT_ROOT,
+            help='Каталог снимков, по умолчанию CATALOG_SNAPSHOT_ROOT'
+        )
+
+    def handle(self, *args, **options):
+        if not options['path']:
+            raise CommandError('Укажите --path или CATALOG_SNAPSHOT_ROOT')
+        changed = write_catalog_snapshots(options['path'])
+        self.stdout.write(f'Изменено файлов: {changed}')
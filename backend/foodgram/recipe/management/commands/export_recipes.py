@@ -0,0 +1,38 @@
+import sys
+import time
+
+from django.core.management import BaseCommand
+
+from api.recipe_ndjson import export_lines
+from recipe.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Выгружает рецепты в NDJSON-файл (- для stdout)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--author', help='Почта автора')
+
+    def handle(self, *args, **options):
+        queryset = Recipe.objects.all()
+        if options['author']:
+            queryset = queryset.filter(author__email=options['author'])
+        started = time.perf_counter()
+        count = 0
+        file = (
+            sys.stdout if options['path'] == '-'
+            else open(options['path'], 'w', encoding='utf-8')
+        )
+        try:
+            for line in export_lines(queryset):
+                file.write(line)
+                count += 1
+        finally:
+            if file is not sys.stdout:
+                file.close()
+        seconds = time.perf_counter() - started
+        self.stderr.write(
+            f'Выгружено {count} за {seconds:.1f} с '
+            f'({count / max(seconds, 1e-9):.0f} записей/с)'
+        )
@@ -0,0 +1,47 @@
+from django.core.management import BaseCommand
+from django.db.models import Q
+
+from recipe.image_variants import (AVATAR_WIDTHS, RECIPE_IMAGE_WIDTHS,
+                                   create_image_variants)
+from recipe.models import Recipe, User
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные копии для уже загруженных изображений'
+
+    def handle(self, *args, **kwargs):
+        # У рецепта сдвигается updated_at, чтобы сменились ETag и
+        # Last-Modified. Кеш рецептов сбрасывают сигналы сохранения
+        # рецепта и автора; сохранение автора и так сдвигает updated_at
+        # его рецептов.
+        self.process(
+            Recipe, 'image', 'image_hash', 'image_width', RECIPE_IMAGE_WIDTHS,
+            extra_fields=['updated_at']
+        )
+        self.process(
+            User, 'avatar', 'avatar_hash', 'avatar_width', AVATAR_WIDTHS
+        )
+
+    def process(self, model, field, hash_field, width_field, widths,
+                extra_fields=()):
+        done = 0
+        # Изображениям, загруженным до учёта ширины, копии создаются
+        # заново: прежние могли быть записаны под чужой шириной.
+        queryset = model.objects.filter(
+            Q(**{hash_field: ''}) | Q(**{width_field: 0})
+        ).exclude(**{f'{field}__in': ('', None)})
+        for instance in queryset.iterator():
+            try:
+                content_hash, width = create_image_variants(
+                    getattr(instance, field), widths
+                )
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'{model.__name__} {instance.pk}: {error}')
+                continue
+            setattr(instance, hash_field, content_hash)
+            setattr(instance, width_field, width)
+            instance.save(
+                update_fields=[hash_field, width_field, *extra_fields]
+            )
+            done += 1
+        self.stdout.write(f'{model._meta.verbose_name_plural}: {done}')
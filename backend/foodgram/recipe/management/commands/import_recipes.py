@@ -0,0 +1,42 @@
+import sys
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from api.recipe_ndjson import IMPORT_BATCH_SIZE, RecipeImporter
+from recipe.models import User
+
+
+class Command(BaseCommand):
+    help = 'Импортирует рецепты из NDJSON-файла (- для stdin)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--author',
+            required=True,
+            help='Почта пользователя, который станет автором'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        author = User.objects.filter(email=options['author']).first()
+        if author is None:
+            raise CommandError(f'Нет пользователя {options["author"]}')
+        started = time.perf_counter()
+        importer = RecipeImporter(author, options['batch_size'])
+        if options['path'] == '-':
+            importer.run(sys.stdin)
+        else:
+            with open(options['path'], encoding='utf-8') as file:
+                importer.run(file)
+        seconds = time.perf_counter() - started
+        for error in importer.errors:
+            self.stderr.write(f'Строка {error["line"]}: {error["errors"]}')
+        self.stdout.write(
+            f'Создано {importer.created}, ошибок {len(importer.errors)} '
+            f'за {seconds:.1f} с '
+            f'({importer.created / max(seconds, 1e-9):.0f} записей/с)'
+        )
@@ -0,0 +1,227 @@
+import re
+import time
+
+from django.apps import apps
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+
+from api.filters import NameAuthorFilter
+from api.pagination import RecipePagination
+from api.shopping_list import shopping_list_rows
+from recipe.management.commands.seed_benchmark import benchmark_user
+from recipe.models import (FeedItem, Ingredient, Recipe, ShoppingCart,
+                           Subscription, Tag, User)
+
+# Последовательное чтение маленьких таблиц (теги) дешевле индекса.
+MIN_TABLE_ROWS = 1000
+# SQLite не сообщает, сколько строк прочитал узел плана, поэтому
+# просмотры и сортировки считаются проблемой только в медленных запросах.
+SQLITE_SLOW_QUERY_MS = 50
+SEQ_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (\w+)$'),
+}
+SORT_PATTERNS = {
+    'postgresql': re.compile(r'Sort Method: external'),
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY'),
+}
+ACTUAL_ROWS_PATTERN = re.compile(r'actual time=\S+ rows=(\d+) loops=(\d+)')
+REMOVED_ROWS_PATTERN = re.compile(r'Rows Removed by Filter: (\d+)')
+FILTER_PATTERN = re.compile(r'^\s*Filter: (.+)$')
+EXECUTION_TIME_PATTERN = re.compile(r'Execution Time: ([\d.]+) ms')
+BUFFERS_PATTERN = re.compile(r'Buffers: (.+)$')
+
+
+def hot_queries(user):
+    """Основные запросы приложения в том виде, в каком их строит API."""
+    page = RecipePagination.page_size
+    recipes = Recipe.objects.with_user_flags(user).order_by('-id')
+    recipe = Recipe.objects.order_by('-id').first()
+    author = Subscription.objects.filter(
+        user=user
+    ).values_list('subsсribed_to', flat=True).first() or user.id
+    authors = User.objects.filter(subscribers__user=user)
+    request = RequestFactory().get('/')
+    request.user = user
+    filters = NameAuthorFilter(queryset=recipes, request=request)
+    tags = list(Tag.objects.values_list('slug', flat=True)[:2])
+    return [
+        ('recipes', recipes[:page]),
+        ('recipes_author', recipes.filter(author_id=author)[:page]),
+        ('recipes_tags', filters.filter_tags(recipes, 'tags', tags)[:page]),
+        (
+            'recipes_favorited',
+            filters.favorited(recipes, 'is_favorited', True)[:page]
+        ),
+        (
+            'recipes_cart',
+            filters.shopping_cart(recipes, 'is_in_shopping_cart', True)[:page]
+        ),
+        (
+            'recipes_search',
+            filters.filter_search(recipes, 'search', 'рецепт 42')[:page]
+        ),
+        ('recipe_detail', recipes.filter(pk=recipe.pk)),
+        ('short_link', Recipe.objects.filter(short=recipe.short)),
+        (
+            'subscriptions',
+            Subscription.objects.filter(
+                user=user
+            ).with_author_data().order_by('id')[:page]
+        ),
+        (
+            'subscription_recipes',
+            Recipe.objects.filter(
+                author__in=authors
+            ).latest_per_author(3).order_by('-id')
+        ),
+        (
+            'feed',
+            FeedItem.objects.filter(user=user).order_by(
+                '-recipe_id'
+            ).values_list('recipe_id', flat=True)[:page]
+        ),
+        ('cart_recipes', ShoppingCart.objects.filter(user=user)),
+        ('download', shopping_list_rows(user)),
+        # Поиск ингредиентов идёт по индексу в памяти, в базу ходит
+        # только его перестройка.
+        (
+            'ingredient_index',
+            Ingredient.objects.values_list('id', 'name', 'measurement_unit')
+        ),
+    ]
+
+
+class PlanChecker:
+    """Читает планы запросов и находит в них полные просмотры таблиц."""
+
+    def __init__(self, min_rows=MIN_TABLE_ROWS):
+        self.vendor = connection.vendor
+        self.min_rows = min_rows
+        self._row_counts = None
+
+    def table_rows(self, table):
+        if self._row_counts is None:
+            self._row_counts = {
+                model._meta.db_table: model._default_manager.count()
+                for model in apps.get_models()
+            }
+        return self._row_counts.get(table)
+
+    def explain(self, queryset):
+        if self.vendor == 'postgresql':
+            return queryset.explain(analyze=True, buffers=True), None
+        started = time.perf_counter()
+        list(queryset)
+        elapsed = (time.perf_counter() - started) * 1000
+        return queryset.explain(), elapsed
+
+    def rows_read(self, line, details):
+        """Сколько строк прочитал узел: есть только в EXPLAIN ANALYZE."""
+        match = ACTUAL_ROWS_PATTERN.search(line)
+        if match is None:
+            return None
+        removed = sum(
+            int(match.group(1)) for match in map(
+                REMOVED_ROWS_PATTERN.search, details
+            ) if match
+        )
+        return (int(match.group(1)) + removed) * int(match.group(2))
+
+    def problems(self, plan, elapsed):
+        seq_scan = SEQ_SCAN_PATTERNS.get(self.vendor)
+        sort = SORT_PATTERNS.get(self.vendor)
+        slow = elapsed >= SQLITE_SLOW_QUERY_MS
+        lines = plan.splitlines()
+        found = []
+        for number, line in enumerate(lines):
+            details = []
+            for following in lines[number + 1:]:
+                if '->' in following:
+                    break
+                details.append(following)
+            match = seq_scan and seq_scan.search(line)
+            if match:
+                table = match.group(1)
+                rows = self.table_rows(table)
+                if rows is None or rows < self.min_rows:
+                    continue
+                read = self.rows_read(line, details)
+                if read is None and not slow or (
+                        read is not None and read < self.min_rows):
+                    continue
+                problem = f'полный просмотр {table} ({rows} строк'
+                problem += ')' if read is None else f', прочитано {read})'
+                conditions = [
+                    FILTER_PATTERN.match(detail).group(1)
+                    for detail in details if FILTER_PATTERN.match(detail)
+                ]
+                if conditions:
+                    problem += f', нет индекса под {conditions[0]}'
+                found.append(problem)
+            elif sort and sort.search(line) and (
+                    self.vendor == 'postgresql' or slow):
+                found.append(f'сортировка без индекса: {line.strip()}')
+        return found
+
+    def check(self, queries):
+        """Список (имя, время в мс, буферы, проблемы, план)."""
+        report = []
+        for name, queryset in queries:
+            plan, elapsed = self.explain(queryset)
+            match = EXECUTION_TIME_PATTERN.search(plan)
+            if match:
+                elapsed = float(match.group(1))
+            match = BUFFERS_PATTERN.search(plan)
+            buffers = match.group(1) if match else ''
+            report.append(
+                (name, elapsed, buffers, self.problems(plan, elapsed), plan)
+            )
+        return report
+
+
+class Command(BaseCommand):
+    help = ('Выполняет основные запросы через EXPLAIN и ищет полные '
+            'просмотры таблиц и сортировки без индекса')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', help='Пользователь для запросов')
+        parser.add_argument('--min-rows', type=int, default=MIN_TABLE_ROWS)
+        parser.add_argument('--only', nargs='*', help='Имена запросов')
+        parser.add_argument(
+            '--plans', action='store_true', help='Печатать планы целиком'
+        )
+        parser.add_argument(
+            '--fail',
+            action='store_true',
+            help='Завершаться с ошибкой, если найдены проблемы'
+        )
+
+    def handle(self, *args, **options):
+        if options['email']:
+            user = User.objects.filter(email=options['email']).first()
+        else:
+            user = benchmark_user() or User.objects.order_by('id').first()
+        if user is None or not Recipe.objects.exists():
+            raise CommandError('Нет данных, запустите seed_benchmark')
+        queries = [
+            (name, queryset) for name, queryset in hot_queries(user)
+            if not options['only'] or name in options['only']
+        ]
+        report = PlanChecker(options['min_rows']).check(queries)
+        total = 0
+        for name, elapsed, buffers, problems, plan in report:
+            status = 'OK' if not problems else f'проблем: {len(problems)}'
+            self.stdout.write(
+                f'{name:<22} {elapsed:9.2f} ms  {status}'
+                + (f'  [{buffers}]' if buffers else '')
+            )
+            for problem in problems:
+                self.stdout.write(f'    {problem}')
+            if options['plans']:
+                self.stdout.write(plan + '\n')
+            total += len(problems)
+        self.stdout.write(f'{connection.vendor}: всего проблем {total}')
+        if total and options['fail']:
+            raise CommandError('В планах запросов есть проблемы')
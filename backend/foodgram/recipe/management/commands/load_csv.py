@@ -1,27 +1,159 @@
 import csv
+import io
+import json
+import os
+import time
 
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
 
-from recipe.models import Ingredient
+from api.catalog_snapshots import (write_ingredient_snapshots,
+                                   write_tag_snapshot)
+from api.ingredient_index import ingredient_index
+from api.tag_catalog import tag_catalog
+from recipe.models import Ingredient, Tag
 
 STATIC_DATA_PATH = 'static/data/'
+BATCH_SIZE = 1000
 
 
 class Command(BaseCommand):
+    help = 'Загружает ингредиенты и теги из ingredients/tags .csv или .json'
 
-    def handle(self, *args, **kwargs):
-        self.import_ingredients()
-
-    def import_ingredients(self):
-        with open(
-            STATIC_DATA_PATH + 'ingredients.csv',
-            'r',
-            encoding='utf-8'
-        ) as file:
-            reader = csv.reader(file)
-            next(reader)
-            for row in reader:
-                Ingredient.objects.get_or_create(
-                    name=row[0],
-                    measurement_unit=row[1]
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=STATIC_DATA_PATH,
+            help='Каталог с файлами ingredients.* и tags.*'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+        )
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='Загрузить ингредиенты через COPY (только PostgreSQL)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только посчитать новые записи, ничего не сохраняя'
+        )
+
+    def handle(self, *args, **options):
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy поддерживается только PostgreSQL')
+        self.options = options
+        started = time.monotonic()
+        ingredients = self.read_rows(
+            'ingredients', ('name', 'measurement_unit')
+        )
+        if ingredients is not None:
+            self.import_ingredients(ingredients)
+        tags = self.read_rows('tags', ('name', 'slug'))
+        if tags is not None:
+            self.import_tags(tags)
+        if ingredients is None and tags is None:
+            raise CommandError(
+                f'В {options["path"]} нет файлов ingredients или tags'
+            )
+        self.stdout.write(
+            f'Готово за {time.monotonic() - started:.3f} с'
+        )
+
+    def read_rows(self, name, fields):
+        for extension in ('json', 'csv'):
+            path = os.path.join(self.options['path'], f'{name}.{extension}')
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r', encoding='utf-8') as file:
+                if extension == 'json':
+                    rows = [
+                        tuple(item[field] for field in fields)
+                        for item in json.load(file)
+                    ]
+                else:
+                    rows = [tuple(row) for row in csv.reader(file) if row]
+            self.stdout.write(f'{path}: {len(rows)} строк')
+            return list(dict.fromkeys(rows))
+        return None
+
+    def report(self, model, total, created):
+        verb = 'будет добавлено' if self.options['dry_run'] else 'добавлено'
+        self.stdout.write(
+            f'{model._meta.verbose_name_plural}: {verb} {created}, '
+            f'уже были {total - created}'
+        )
+
+    def bulk_create(self, model, objects):
+        batch_size = self.options['batch_size']
+        with transaction.atomic():
+            for start in range(0, len(objects), batch_size):
+                model.objects.bulk_create(
+                    objects[start:start + batch_size],
+                    ignore_conflicts=True
                 )
+                self.stdout.write(
+                    f'  {min(start + batch_size, len(objects))}'
+                    f'/{len(objects)}'
+                )
+
+    def import_ingredients(self, rows):
+        if self.options['dry_run']:
+            existing = set(Ingredient.objects.values_list(
+                'name', 'measurement_unit'
+            ))
+            self.report(Ingredient, len(rows), len(set(rows) - existing))
+            return
+        before = Ingredient.objects.count()
+        if self.options['copy']:
+            self.copy_ingredients(rows)
+        else:
+            self.bulk_create(Ingredient, [
+                Ingredient(name=name, measurement_unit=unit)
+                for name, unit in rows
+            ])
+            # bulk_create не отправляет сигналы.
+            ingredient_index.invalidate()
+        self.report(Ingredient, len(rows), Ingredient.objects.count() - before)
+        write_ingredient_snapshots()
+
+    def copy_ingredients(self, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE ingredient_import '
+                '(name varchar(100), measurement_unit varchar(10)) '
+                'ON COMMIT DROP'
+            )
+            cursor.copy_expert(
+                'COPY ingredient_import FROM STDIN WITH (FORMAT csv)',
+                buffer
+            )
+            # У updated_at нет значения по умолчанию в базе: auto_now
+            # заполняет его только при сохранении через ORM.
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit, updated_at) '
+                'SELECT name, measurement_unit, now() FROM ingredient_import '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
+        # Сырой INSERT не отправляет сигналы.
+        ingredient_index.invalidate()
+
+    def import_tags(self, rows):
+        existing = set(Tag.objects.values_list('slug', flat=True))
+        new_tags = [
+            Tag(name=name, slug=slug)
+            for slug, name in {slug: name for name, slug in rows}.items()
+            if slug not in existing
+        ]
+        if not self.options['dry_run']:
+            self.bulk_create(Tag, new_tags)
+            tag_catalog.invalidate()
+            write_tag_snapshot()
+        self.report(Tag, len(rows), len(new_tags))
@@ -0,0 +1,98 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from django.core.management import BaseCommand, CommandError
+
+from recipe.management.commands.benchmark import percentile
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ')[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+class Command(BaseCommand):
+    help = ('Нагружает запущенный сервер множеством одновременных '
+            'соединений и считает пропускную способность')
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Например http://127.0.0.1:8000')
+        parser.add_argument('paths', nargs='+')
+        parser.add_argument('--concurrency', type=int, default=500)
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument('--token', help='Токен для Authorization')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError('Поддерживается только http://хост[:порт]')
+        self.host, self.port = url.hostname, url.port or 80
+        auth = (
+            f'Authorization: Token {options["token"]}\r\n'
+            if options['token'] else ''
+        )
+        self.requests = [
+            (
+                f'GET {path} HTTP/1.1\r\nHost: {url.netloc}\r\n{auth}\r\n'
+            ).encode()
+            for path in options['paths']
+        ]
+        self.latencies = []
+        self.errors = 0
+        started = time.perf_counter()
+        asyncio.run(self.run(options['concurrency'], options['duration']))
+        elapsed = time.perf_counter() - started
+        if not self.latencies:
+            raise CommandError('Ни один запрос не выполнен')
+        self.stdout.write(
+            f'{len(self.latencies)} запросов за {elapsed:.1f} с, '
+            f'{len(self.latencies) / elapsed:.0f} rps, '
+            f'ошибок {self.errors}\n'
+            f'p50 {percentile(self.latencies, 50):.1f} мс, '
+            f'p95 {percentile(self.latencies, 95):.1f} мс, '
+            f'p99 {percentile(self.latencies, 99):.1f} мс'
+        )
+
+    async def run(self, concurrency, duration):
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(
+            self.client(index, deadline) for index in range(concurrency)
+        ))
+
+    async def client(self, index, deadline):
+        writer = None
+        number = index
+        while time.perf_counter() < deadline:
+            request = self.requests[number % len(self.requests)]
+            number += 1
+            started = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(
+                        self.host, self.port
+                    )
+                writer.write(request)
+                await writer.drain()
+                status, keep_alive = await read_response(reader)
+            except (OSError, asyncio.IncompleteReadError):
+                self.errors += 1
+                writer = None
+                await asyncio.sleep(0.01)
+                continue
+            if status >= 400:
+                self.errors += 1
+            self.latencies.append((time.perf_counter() - started) * 1000)
+            if not keep_alive:
+                writer.close()
+                writer = None
+        if writer is not None:
+            writer.close()
@@ -0,0 +1,14 @@
+from django.apps import apps
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipe.cart_totals import rebuild_cart_totals
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает итоги корзин по содержимому корзин'
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            created = rebuild_cart_totals(apps.get_model)
+        self.stdout.write(f'Итоги корзин: {created} строк')
@@ -0,0 +1,15 @@
+from django.apps import apps
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipe.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики рецептов, подписчиков и избранного'
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            fixed = rebuild_counters(apps.get_model)
+        for counter, count in fixed.items():
+            self.stdout.write(f'{counter}: исправлено {count}')
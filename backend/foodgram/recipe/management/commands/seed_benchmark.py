@@ -0,0 +1,261 @@
+import random
+import time
+
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+from api.authentication import token_cache, token_cache_key
+from api.catalog_snapshots import write_tag_snapshot
+from api.pantry_index import pantry_index
+from api.tag_catalog import tag_catalog
+from recipe.cart_totals import rebuild_cart_totals
+from recipe.counters import rebuild_counters
+from recipe.feed import rebuild_feed
+from recipe.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                           ShoppingCart, Subscription, Tag, User)
+from recipe.search import search_backend
+from recipe.short_links import encode_short_link
+
+BENCHMARK_EMAIL_DOMAIN = 'benchmark.local'
+BENCHMARK_PASSWORD = 'benchmark-password'
+BENCHMARK_IMAGE = 'recipe/images/benchmark.png'
+BATCH_SIZE = 5000
+
+
+def raw_delete(queryset):
+    """DELETE одним запросом: без сигналов и обхода каскада по строкам."""
+    return queryset._raw_delete(queryset.db)
+
+
+def benchmark_user():
+    return User.objects.filter(
+        email__endswith='@' + BENCHMARK_EMAIL_DOMAIN
+    ).order_by('id').first()
+
+
+class Command(BaseCommand):
+    help = 'Создаёт детерминированный синтетический набор данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--tags', type=int, default=12)
+        parser.add_argument(
+            '--ingredients-per-recipe', type=float, default=8,
+            help='Среднее число ингредиентов в рецепте'
+        )
+        parser.add_argument('--favorites-per-user', type=int, default=20)
+        parser.add_argument('--cart-per-user', type=int, default=5)
+        parser.add_argument('--subscriptions-per-user', type=int, default=15)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--flush',
+            action='store_true',
+            help='Удалить данные предыдущего запуска'
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.random = random.Random(options['seed'])
+        started = time.monotonic()
+        if options['flush']:
+            self.flush()
+        elif benchmark_user() is not None:
+            raise CommandError(
+                'Данные уже созданы, используйте --flush для пересоздания'
+            )
+        self.ingredient_ids = list(
+            Ingredient.objects.values_list('id', flat=True)
+        )
+        if not self.ingredient_ids:
+            raise CommandError('Каталог ингредиентов пуст, запустите load_csv')
+        with transaction.atomic():
+            users = self.create_users()
+            tags = self.create_tags()
+            recipes = self.create_recipes(users)
+            self.create_recipe_relations(recipes, tags)
+            self.create_user_relations(users, recipes)
+            # bulk_create не вызывает сигналы, счётчики пересчитываются явно.
+            rebuild_counters(apps.get_model)
+            self.step('Записи лент', rebuild_feed(apps.get_model))
+            self.step(
+                'Итоги корзин', rebuild_cart_totals(apps.get_model)
+            )
+            search_backend().rebuild()
+        tag_catalog.invalidate()
+        write_tag_snapshot()
+        pantry_index.invalidate()
+        token = Token.objects.get_or_create(user=users[0])[0]
+        self.stdout.write(
+            f'Готово за {time.monotonic() - started:.1f} с, '
+            f'пользователь {users[0].email}, токен {token.key}'
+        )
+
+    def step(self, message, count):
+        self.stdout.write(f'{message}: {count}')
+
+    def flush(self):
+        """Удаляет данные прошлого запуска пачкой DELETE по таблицам.
+
+        Обычное удаление вызывает сигналы на каждую строку (кеш, индексы,
+        итоги корзин) и на миллионе рецептов идёт часами. Производные
+        таблицы, индексы и счётчики пересчитываются после заполнения.
+        """
+        users = User.objects.filter(
+            email__endswith='@' + BENCHMARK_EMAIL_DOMAIN
+        )
+        targets = {
+            User: users,
+            Recipe: Recipe.objects.filter(author__in=users),
+            Tag: Tag.objects.filter(slug__startswith='benchmark-'),
+        }
+        token_cache().delete_many([
+            token_cache_key(key)
+            for key in Token.objects.filter(user__in=users).values_list(
+                'key', flat=True
+            )
+        ])
+        deleted = 0
+        with transaction.atomic():
+            for model in apps.get_models(include_auto_created=True):
+                if model in targets:
+                    continue
+                for field in model._meta.concrete_fields:
+                    if field.is_relation and field.related_model in targets:
+                        deleted += raw_delete(model.objects.filter(**{
+                            f'{field.name}__in': targets[field.related_model]
+                        }))
+            for queryset in (targets[Recipe], targets[User], targets[Tag]):
+                deleted += raw_delete(queryset)
+        # Id удалённых рецептов могут достаться новым.
+        caches['recipes'].clear()
+        self.step('Удалено строк', deleted)
+
+    def create_users(self):
+        password = make_password(BENCHMARK_PASSWORD)
+        User.objects.bulk_create(
+            [
+                User(
+                    username=f'bench{index}',
+                    email=f'bench{index}@{BENCHMARK_EMAIL_DOMAIN}',
+                    first_name='Бенч',
+                    last_name=str(index),
+                    password=password,
+                )
+                for index in range(self.options['users'])
+            ],
+            batch_size=BATCH_SIZE
+        )
+        users = list(User.objects.filter(
+            email__endswith='@' + BENCHMARK_EMAIL_DOMAIN
+        ).order_by('id'))
+        self.step('Пользователи', len(users))
+        return users
+
+    def create_tags(self):
+        Tag.objects.bulk_create([
+            Tag(name=f'Тег {index}', slug=f'benchmark-{index}')
+            for index in range(self.options['tags'])
+        ])
+        tags = list(Tag.objects.filter(slug__startswith='benchmark-'))
+        self.step('Теги', len(tags))
+        return tags
+
+    def author_weights(self, users):
+        # Популярность авторов распределена по степенному закону.
+        return [1 / (rank + 1) ** 1.1 for rank in range(len(users))]
+
+    def create_recipes(self, users):
+        authors = self.random.choices(
+            users, self.author_weights(users), k=self.options['recipes']
+        )
+        Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    name=f'Рецепт {index}',
+                    title=f'Рецепт {index}',
+                    author=author,
+                    image=BENCHMARK_IMAGE,
+                    text='Синтетический рецепт для нагрузочных тестов. ' * 5,
+                    cooking_time=self.random.randint(5, 180),
+                )
+                for index, author in enumerate(authors)
+            ],
+            batch_size=BATCH_SIZE
+        )
+        recipes = list(
+            Recipe.objects.filter(author__in=users).only('id').order_by('id')
+        )
+        for recipe in recipes:
+            recipe.short = encode_short_link(recipe.id)
+        Recipe.objects.bulk_update(recipes, ['short'], batch_size=BATCH_SIZE)
+        self.step('Рецепты', len(recipes))
+        return recipes
+
+    def ingredient_count(self):
+        mean = self.options['ingredients_per_recipe']
+        count = round(self.random.lognormvariate(0, 0.4) * mean)
+        return max(1, min(count, 30, len(self.ingredient_ids)))
+
+    def create_recipe_relations(self, recipes, tags):
+        recipe_tags = []
+        recipe_ingredients = []
+        through = Recipe.tags.through
+        for recipe in recipes:
+            for tag in self.random.sample(
+                tags, self.random.randint(1, min(3, len(tags)))
+            ):
+                recipe_tags.append(through(recipe_id=recipe.id, tag=tag))
+            for ingredient_id in self.random.sample(
+                self.ingredient_ids, self.ingredient_count()
+            ):
+                recipe_ingredients.append(RecipeIngredient(
+                    recipe_id=recipe.id,
+                    ingredient_id=ingredient_id,
+                    amount=self.random.randint(1, 500),
+                ))
+        through.objects.bulk_create(recipe_tags, batch_size=BATCH_SIZE)
+        RecipeIngredient.objects.bulk_create(
+            recipe_ingredients, batch_size=BATCH_SIZE
+        )
+        self.step('Теги рецептов', len(recipe_tags))
+        self.step('Ингредиенты рецептов', len(recipe_ingredients))
+
+    def sample(self, population, count, weights=None):
+        count = min(count, len(population))
+        if weights is None:
+            return self.random.sample(population, count)
+        chosen = {}
+        for item in self.random.choices(population, weights, k=count * 2):
+            chosen[item.id] = item
+            if len(chosen) == count:
+                break
+        return list(chosen.values())
+
+    def create_user_relations(self, users, recipes):
+        weights = self.author_weights(users)
+        favorites, carts, subscriptions = [], [], []
+        for user in users:
+            for recipe in self.sample(
+                recipes, self.options['favorites_per_user']
+            ):
+                favorites.append(Favorite(user=user, recipe_id=recipe.id))
+            for recipe in self.sample(recipes, self.options['cart_per_user']):
+                carts.append(ShoppingCart(user=user, recipe_id=recipe.id))
+            for author in self.sample(
+                users, self.options['subscriptions_per_user'], weights
+            ):
+                if author.id != user.id:
+                    subscriptions.append(
+                        Subscription(user=user, subsсribed_to=author)
+                    )
+        Favorite.objects.bulk_create(favorites, batch_size=BATCH_SIZE)
+        ShoppingCart.objects.bulk_create(carts, batch_size=BATCH_SIZE)
+        Subscription.objects.bulk_create(subscriptions, batch_size=BATCH_SIZE)
+        self.step('Избранное', len(favorites))
+        self.step('Корзины', len(carts))
+        self.step('Подписки', len(subscriptions))
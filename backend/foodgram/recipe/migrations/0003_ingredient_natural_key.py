@@ -0,0 +1,53 @@
+# Generated by Django 3.2.3 on 2026-10-18 01:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipe', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipe', 'RecipeIngredient')
+    kept = {}
+    for ingredient_id, name, unit in Ingredient.objects.order_by(
+        'id'
+    ).values_list('id', 'name', 'measurement_unit'):
+        keeper = kept.setdefault((name, unit), ingredient_id)
+        if keeper == ingredient_id:
+            continue
+        # В рецепте уже есть оставляемый ингредиент: количества
+        # складываются, единица у них одна.
+        kept_rows = RecipeIngredient.objects.filter(ingredient_id=keeper)
+        for row in list(RecipeIngredient.objects.filter(
+            ingredient_id=ingredient_id,
+            recipe_id__in=kept_rows.values('recipe_id')
+        )):
+            kept_rows.filter(recipe_id=row.recipe_id).update(
+                amount=models.F('amount') + row.amount
+            )
+            row.delete()
+        RecipeIngredient.objects.filter(
+            ingredient_id=ingredient_id
+        ).update(ingredient_id=keeper)
+        Ingredient.objects.filter(id=ingredient_id).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0002_auto_20241103_2134'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='favorite',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='favorites', to='recipe.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient_name_unit'),
+        ),
+    ]
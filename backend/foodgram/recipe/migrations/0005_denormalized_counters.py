@@ -0,0 +1,35 @@
+# Generated by Django 3.2.3 on 2026-10-18 01:57
+
+from django.db import migrations, models
+
+from recipe.counters import rebuild_counters
+
+
+def fill_counters(apps, schema_editor):
+    rebuild_counters(apps.get_model)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0004_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число рецептов'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='subscribers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число подписчиков'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
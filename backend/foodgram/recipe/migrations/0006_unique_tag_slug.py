@@ -0,0 +1,37 @@
+# Generated by Django 3.2.3 on 2026-10-18 01:59
+
+from django.db import migrations, models
+
+
+def merge_duplicate_slugs(apps, schema_editor):
+    Tag = apps.get_model('recipe', 'Tag')
+    RecipeTag = apps.get_model('recipe', 'Recipe').tags.through
+    kept = {}
+    for tag_id, slug in Tag.objects.order_by('id').values_list('id', 'slug'):
+        keeper = kept.setdefault(slug, tag_id)
+        if keeper == tag_id:
+            continue
+        RecipeTag.objects.filter(
+            tag_id=tag_id,
+            recipe_id__in=RecipeTag.objects.filter(
+                tag_id=keeper
+            ).values('recipe_id')
+        ).delete()
+        RecipeTag.objects.filter(tag_id=tag_id).update(tag_id=keeper)
+        Tag.objects.filter(id=tag_id).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0005_denormalized_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tag',
+            name='slug',
+            field=models.CharField(max_length=100, unique=True, verbose_name='Описание'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+from recipe.search import search_backend
+
+
+def install_search(apps, schema_editor):
+    backend = search_backend(schema_editor.connection.alias)
+    for sql in backend.install_sql:
+        schema_editor.execute(sql)
+    backend.rebuild()
+
+
+def uninstall_search(apps, schema_editor):
+    backend = search_backend(schema_editor.connection.alias)
+    for sql in backend.uninstall_sql:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0006_unique_tag_slug'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
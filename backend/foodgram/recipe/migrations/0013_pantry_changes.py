@@ -0,0 +1,25 @@
+# Generated by Django 3.2.3 on 2026-10-18 03:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0012_catalog_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PantryChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe_id', models.PositiveIntegerField(null=True, verbose_name='Рецепт')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Время изменения')),
+            ],
+            options={
+                'verbose_name': 'Изменение индекса продуктов',
+                'verbose_name_plural': 'Изменения индекса продуктов',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.3 on 2026-10-18 03:33
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0013_pantry_changes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='ingredient_name_prefix_idx',
+        ),
+    ]
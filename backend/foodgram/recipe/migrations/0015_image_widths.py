@@ -0,0 +1,23 @@
+# Generated by Django 3.2.3 on 2026-10-18 03:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0014_drop_ingredient_name_prefix_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_width',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Ширина изображения'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='avatar_width',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Ширина аватара'),
+        ),
+    ]
@@ -1,6 +1,12 @@
 from django.db import models
+from django.db.models.expressions import RawSQL, Window
+from django.db.models.functions import RowNumber
 from django.contrib.auth.models import AbstractUser
-from django.utils.crypto import get_random_string
+
+from recipe.image_variants import (AVATAR_WIDTHS, RECIPE_IMAGE_WIDTHS,
+                                   create_image_variants)
+from recipe.search import search_backend
+from recipe.short_links import encode_short_link
 
 
 class User(AbstractUser):
@@ -18,6 +24,27 @@ class User(AbstractUser):
         blank=True,
         null=True
     )
+    avatar_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        verbose_name='Хеш аватара'
+    )
+    avatar_width = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Ширина аватара'
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число рецептов'
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число подписчиков'
+    )
     REQUIRED_FIELDS = ['first_name', 'last_name', 'username']
     USERNAME_FIELD = 'email'
 
@@ -28,6 +55,16 @@ class User(AbstractUser):
     def __str__(self):
         return self.email
 
+    def save(self, *args, **kwargs):
+        if not self.avatar:
+            self.avatar_hash = ''
+            self.avatar_width = 0
+        elif not self.avatar._committed:
+            self.avatar_hash, self.avatar_width = create_image_variants(
+                self.avatar, AVATAR_WIDTHS
+            )
+        super().save(*args, **kwargs)
+
 
 class Ingredient(models.Model):
     name = models.CharField(max_length=100, verbose_name='Имя')
@@ -35,8 +72,18 @@ class Ingredient(models.Model):
         max_length=10,
         verbose_name='Единица измерения'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Изменено'
+    )
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient_name_unit'
+            )
+        ]
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
 
@@ -46,7 +93,15 @@ class Ingredient(models.Model):
 
 class Tag(models.Model):
     name = models.CharField(max_length=50, verbose_name='Имя')
-    slug = models.CharField(max_length=100, verbose_name='Описание')
+    slug = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='Описание'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Изменено'
+    )
 
     class Meta:
         verbose_name = 'Тег'
@@ -56,6 +111,52 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self):
+        return self.select_related('author').prefetch_related(
+            'tags',
+            models.Prefetch(
+                'ingredients_in_recipe',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
+
+    def with_user_flags(self, user):
+        if not user.is_authenticated:
+            return self
+        return self.annotate(
+            is_favorited=models.Exists(Favorite.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            )),
+            is_in_shopping_cart=models.Exists(ShoppingCart.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            )),
+            is_author_subscribed=models.Exists(Subscription.objects.filter(
+                user=user, subsсribed_to=models.OuterRef('author')
+            )),
+        )
+
+    def search(self, query):
+        """Полнотекстовый поиск с аннотацией search_rank."""
+        return search_backend(self.db).search(self, query)
+
+    def latest_per_author(self, limit):
+        ranked = self.annotate(
+            recipe_rank=Window(
+                RowNumber(),
+                partition_by=[models.F('author')],
+                order_by=models.F('pk').desc()
+            )
+        ).values('pk', 'recipe_rank')
+        sql, params = ranked.query.sql_with_params()
+        return self.model.objects.filter(pk__in=RawSQL(
+            f'SELECT ranked.id FROM ({sql}) ranked '
+            'WHERE ranked.recipe_rank <= %s',
+            (*params, limit)
+        ))
+
+
 class Recipe(models.Model):
     name = models.CharField(max_length=50)
     author = models.ForeignKey(
@@ -69,6 +170,17 @@ class Recipe(models.Model):
         upload_to='recipe/images',
         verbose_name='Изображение'
     )
+    image_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        verbose_name='Хеш изображения'
+    )
+    image_width = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Ширина изображения'
+    )
     text = models.TextField(verbose_name='Описание')
     tags = models.ManyToManyField(Tag, verbose_name='Тег')
     cooking_time = models.PositiveIntegerField(verbose_name='Время')
@@ -84,19 +196,40 @@ class Recipe(models.Model):
         through='RecipeIngredient',
         verbose_name='Ингредиенты'
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном'
+    )
+    # Меняется вместе с представлением рецепта, в том числе при правке
+    # тегов, ингредиентов, автора и числа добавлений в избранное.
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Изменено'
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
+        indexes = [
+            # Рецепты автора от новых к старым без сортировки.
+            models.Index(
+                fields=('author', '-id'),
+                name='recipe_author_id_desc_idx'
+            ),
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
     def save(self, *args, **kwargs):
-        short = get_random_string(length=15)
-        self.short = short
-        if Recipe.objects.filter(short=short).exists():
-            while not (Recipe.objects.filter(short=short).exists()):
-                self.short = get_random_string(length=15)
-
+        if self.image and not self.image._committed:
+            self.image_hash, self.image_width = create_image_variants(
+                self.image, RECIPE_IMAGE_WIDTHS
+            )
         super().save(*args, **kwargs)
+        if not self.short:
+            self.short = encode_short_link(self.pk)
+            Recipe.objects.filter(pk=self.pk).update(short=self.short)
 
 
 class RecipeIngredient(models.Model):
@@ -121,6 +254,13 @@ class RecipeIngredient(models.Model):
                 name='unique_recipe_ingredients'
             )
         ]
+        indexes = [
+            # Покрывающий индекс для суммы ингредиентов корзины.
+            models.Index(
+                fields=('recipe', 'ingredient', 'amount'),
+                name='recipe_ingredient_amount_idx'
+            ),
+        ]
 
 
 class Favorite(models.Model):
@@ -147,6 +287,12 @@ class Favorite(models.Model):
         verbose_name_plural = 'Избранные'
 
 
+class SubscriptionQuerySet(models.QuerySet):
+
+    def with_author_data(self):
+        return self.select_related('subsсribed_to')
+
+
 class Subscription(models.Model):
     user = models.ForeignKey(
         User,
@@ -161,6 +307,8 @@ class Subscription(models.Model):
         verbose_name='На кого подписан'
     )
 
+    objects = SubscriptionQuerySet.as_manager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -172,6 +320,48 @@ class Subscription(models.Model):
         verbose_name_plural = 'Подписки'
 
 
+class FeedItem(models.Model):
+    """Рецепт в ленте подписчика, записывается при публикации."""
+
+    # Отдельный индекс не нужен: user первым входит в составные.
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name='feed_items',
+        verbose_name='Подписчик'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Рецепт'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_user_feed_recipe'
+            )
+        ]
+        indexes = [
+            # Удаление записей автора из ленты при отписке.
+            models.Index(
+                fields=('user', 'author'),
+                name='feed_item_user_author_idx'
+            ),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+
+
 class ShoppingCart(models.Model):
     user = models.ForeignKey(
         User,
@@ -194,3 +384,68 @@ class ShoppingCart(models.Model):
         ]
         verbose_name = 'Корзина'
         verbose_name_plural = 'Корзины'
+
+
+class CartTotal(models.Model):
+    """Сумма ингредиента по всем рецептам корзины пользователя."""
+
+    # Отдельный индекс не нужен: user первым входит в уникальный.
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name='cart_totals',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Ингредиент'
+    )
+    total = models.PositiveIntegerField(verbose_name='Количество')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_user_cart_ingredient'
+            )
+        ]
+        verbose_name = 'Итог корзины'
+        verbose_name_plural = 'Итоги корзин'
+
+
+class CatalogVersion(models.Model):
+    """Версия справочника в памяти процессов, общая для всех процессов."""
+
+    name = models.CharField(
+        max_length=50,
+        primary_key=True,
+        verbose_name='Справочник'
+    )
+    version = models.BigIntegerField(verbose_name='Версия')
+
+    class Meta:
+        verbose_name = 'Версия справочника'
+        verbose_name_plural = 'Версии справочников'
+
+
+class PantryChange(models.Model):
+    """Журнал изменений состава рецептов для индекса подбора по продуктам.
+
+    Пустой recipe_id означает, что индекс нужно перестроить целиком.
+    """
+
+    recipe_id = models.PositiveIntegerField(
+        null=True,
+        verbose_name='Рецепт'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Время изменения'
+    )
+
+    class Meta:
+        verbose_name = 'Изменение индекса продуктов'
+        verbose_name_plural = 'Изменения индекса продуктов'
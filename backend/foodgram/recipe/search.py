@@ -0,0 +1,168 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'russian'
+WORD_RE = re.compile(r'\w+')
+
+
+class RecipeSearch:
+    """Поиск без индекса для прочих баз."""
+
+    install_sql = ()
+    uninstall_sql = ()
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def search(self, queryset, query):
+        condition = Q()
+        for word in WORD_RE.findall(query):
+            condition &= (
+                Q(name__icontains=word)
+                | Q(title__icontains=word)
+                | Q(text__icontains=word)
+            )
+        return queryset.filter(condition).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+    def update(self, recipes):
+        pass
+
+    def remove(self, recipe_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class PostgresRecipeSearch(RecipeSearch):
+    """Колонка tsvector с GIN-индексом, заполняется триггером в базе."""
+
+    install_sql = (
+        'ALTER TABLE recipe_recipe ADD COLUMN search_vector tsvector',
+        f'''
+        CREATE FUNCTION recipe_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector :=
+                setweight(to_tsvector('{SEARCH_CONFIG}',
+                                      coalesce(NEW.name, '')), 'A') ||
+                setweight(to_tsvector('{SEARCH_CONFIG}',
+                                      coalesce(NEW.title, '')), 'A') ||
+                setweight(to_tsvector('{SEARCH_CONFIG}',
+                                      coalesce(NEW.text, '')), 'B');
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        ''',
+        '''
+        CREATE TRIGGER recipe_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF name, title, text ON recipe_recipe
+        FOR EACH ROW EXECUTE FUNCTION recipe_search_vector_update()
+        ''',
+        'UPDATE recipe_recipe SET name = name',
+        'CREATE INDEX recipe_search_vector_idx ON recipe_recipe '
+        'USING GIN (search_vector)',
+    )
+    uninstall_sql = (
+        'DROP TRIGGER recipe_search_vector_trigger ON recipe_recipe',
+        'DROP FUNCTION recipe_search_vector_update()',
+        'ALTER TABLE recipe_recipe DROP COLUMN search_vector',
+    )
+
+    def search(self, queryset, query):
+        tsquery = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+        return queryset.filter(RawSQL(
+            f'recipe_recipe.search_vector @@ {tsquery}',
+            (query,),
+            output_field=BooleanField()
+        )).annotate(search_rank=RawSQL(
+            f'ts_rank_cd(recipe_recipe.search_vector, {tsquery})',
+            (query,),
+            output_field=FloatField()
+        ))
+
+
+class SqliteRecipeSearch(RecipeSearch):
+    """Таблица FTS5 для разработки и тестов без PostgreSQL.
+
+    Триггеры SQLite теряются, когда Django пересоздаёт таблицу в
+    миграциях, поэтому индекс обновляется из кода (сигналами).
+    """
+
+    install_sql = (
+        "CREATE VIRTUAL TABLE recipe_search USING fts5("
+        "name, title, text, tokenize='unicode61 remove_diacritics 2')",
+    )
+    uninstall_sql = ('DROP TABLE recipe_search',)
+
+    @staticmethod
+    def match_expression(query):
+        # Каждое слово ищется как префикс, слова объединяются через AND.
+        return ' '.join(f'"{word}"*' for word in WORD_RE.findall(query))
+
+    def search(self, queryset, query):
+        match = self.match_expression(query)
+        if not match:
+            return queryset.annotate(
+                search_rank=Value(0.0, output_field=FloatField())
+            ).none()
+        # Соединение с FTS-таблицей: bm25 считается один раз на совпадение,
+        # коррелированный подзапрос повторял бы MATCH для каждой строки.
+        return queryset.extra(
+            tables=['recipe_search'],
+            where=[
+                'recipe_search.rowid = recipe_recipe.id',
+                'recipe_search MATCH %s',
+            ],
+            params=[match],
+            select={
+                'search_rank': '-bm25(recipe_search, 10.0, 10.0, 1.0)'
+            },
+        )
+
+    def update(self, recipes):
+        rows = [
+            (recipe.pk, recipe.name, recipe.title, recipe.text)
+            for recipe in recipes
+        ]
+        with self.connection.cursor() as cursor:
+            self._delete(cursor, [row[0] for row in rows])
+            cursor.executemany(
+                'INSERT INTO recipe_search (rowid, name, title, text) '
+                'VALUES (%s, %s, %s, %s)',
+                rows
+            )
+
+    def remove(self, recipe_ids):
+        with self.connection.cursor() as cursor:
+            self._delete(cursor, recipe_ids)
+
+    @staticmethod
+    def _delete(cursor, recipe_ids):
+        cursor.executemany(
+            'DELETE FROM recipe_search WHERE rowid = %s',
+            [(pk,) for pk in recipe_ids]
+        )
+
+    def rebuild(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('DELETE FROM recipe_search')
+            cursor.execute(
+                'INSERT INTO recipe_search (rowid, name, title, text) '
+                'SELECT id, name, title, text FROM recipe_recipe'
+            )
+
+
+BACKENDS = {
+    'postgresql': PostgresRecipeSearch,
+    'sqlite': SqliteRecipeSearch,
+}
+
+
+def search_backend(using='default'):
+    connection = connections[using]
+    return BACKENDS.get(connection.vendor, RecipeSearch)(connection)
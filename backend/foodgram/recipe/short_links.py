@@ -0,0 +1,52 @@
+import hashlib
+import hmac
+import string
+
+from django.conf import settings
+
+ALPHABET = string.digits + string.ascii_letters
+HALF_BITS = 23
+HALF_MASK = (1 << HALF_BITS) - 1
+ROUNDS = 4
+SHORT_LINK_LENGTH = 8
+
+
+def _round(value, round_number):
+    digest = hmac.new(
+        settings.SHORT_LINK_SECRET.encode(),
+        f'{round_number}:{value}'.encode(),
+        hashlib.sha256
+    ).digest()
+    return int.from_bytes(digest[:4], 'big') & HALF_MASK
+
+
+def _permute(value, rounds):
+    left, right = value >> HALF_BITS, value & HALF_MASK
+    for round_number in rounds:
+        left, right = right, left ^ _round(right, round_number)
+    return (right << HALF_BITS) | left
+
+
+def encode_short_link(recipe_id):
+    """Короткий код рецепта: base62 от перестановки id по ключу."""
+    value = _permute(recipe_id, range(ROUNDS))
+    chars = []
+    for _ in range(SHORT_LINK_LENGTH):
+        value, index = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[index])
+    return ''.join(reversed(chars))
+
+
+def decode_short_link(short):
+    """id рецепта по короткому коду или None, если код не нашего формата."""
+    if len(short) != SHORT_LINK_LENGTH:
+        return None
+    value = 0
+    for char in short:
+        index = ALPHABET.find(char)
+        if index < 0:
+            return None
+        value = value * len(ALPHABET) + index
+    if value >> (2 * HALF_BITS):
+        return None
+    return _permute(value, reversed(range(ROUNDS)))
@@ -0,0 +1,116 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from recipe import cart_totals
+from recipe.counters import change_counter
+from recipe.feed import backfill, fan_out, forget
+from recipe.models import (CartTotal, Favorite, Recipe, RecipeIngredient,
+                           ShoppingCart, Subscription, User)
+from recipe.search import search_backend
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_search_saved(sender, instance, using, **kwargs):
+    search_backend(using).update([instance])
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_search_deleted(sender, instance, using, **kwargs):
+    search_backend(using).remove([instance.pk])
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            User, instance.subsсribed_to_id, 'subscribers_count', 1
+        )
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    change_counter(User, instance.subsсribed_to_id, 'subscribers_count', -1)
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            Recipe, instance.recipe_id, 'favorites_count', 1,
+            updated_at=timezone.now()
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    change_counter(
+        Recipe, instance.recipe_id, 'favorites_count', -1,
+        updated_at=timezone.now()
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, **kwargs):
+    if created:
+        fan_out(instance.author_id, [instance.pk])
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_feed_created(sender, instance, created, **kwargs):
+    if created:
+        backfill(instance.user_id, instance.subsсribed_to_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_feed_deleted(sender, instance, **kwargs):
+    forget(instance.user_id, instance.subsсribed_to_id)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def cart_recipe_added(sender, instance, created, **kwargs):
+    if created:
+        cart_totals.add_recipe(instance.user_id, instance.recipe_id)
+
+
+# До удаления: при удалении рецепта его ингредиенты ещё на месте.
+@receiver(pre_delete, sender=ShoppingCart)
+def cart_recipe_removed(sender, instance, **kwargs):
+    cart_totals.remove_recipe(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def cart_ingredient_changed(sender, instance, **kwargs):
+    cart_totals.refresh([instance.recipe_id], [instance.ingredient_id])
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def cart_ingredients_added(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    # Удаление строк состава приходит через post_delete выше.
+    if action != 'post_add':
+        return
+    if reverse:
+        cart_totals.refresh(pk_set, [instance.pk])
+    else:
+        cart_totals.refresh([instance.pk], pk_set)
+
+
+# Каскадное удаление рецептов пользователя пересчитывает итоги корзин уже
+# после удаления его собственных строк, поэтому они чистятся ещё раз.
+@receiver(post_delete, sender=User)
+def cart_owner_deleted(sender, instance, **kwargs):
+    CartTotal.objects.filter(user_id=instance.pk).delete()
@@ -0,0 +1,147 @@
+import base64
+from io import BytesIO
+
+import pytest
+from django.core.cache import caches
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.ingredient_index import ingredient_index
+from api.pantry_index import pantry_index
+from api.tag_catalog import tag_catalog
+from api.views import resolve_short_link
+from recipe.models import Ingredient, Recipe, RecipeIngredient, Tag, User
+
+IMAGE = 'recipe/images/test.png'
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Кеши и копии справочников в памяти не переживают тест."""
+    for cache in caches.all():
+        cache.clear()
+    for catalog in (tag_catalog, ingredient_index, pantry_index):
+        catalog._version = None
+        catalog._known_version = None
+    resolve_short_link.cache_clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    return settings.MEDIA_ROOT
+
+
+def create_user(number):
+    return User.objects.create_user(
+        email=f'user{number}@example.com',
+        username=f'user{number}',
+        first_name='Имя',
+        last_name='Фамилия',
+        password='Test-password-123',
+    )
+
+
+@pytest.fixture
+def user(db):
+    return create_user(1)
+
+
+@pytest.fixture
+def another_user(db):
+    return create_user(2)
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+
+def client_for(user):
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+@pytest.fixture
+def user_client(user):
+    return client_for(user)
+
+
+@pytest.fixture
+def tags(db):
+    return [
+        Tag.objects.create(
+            name=f'Тег {number}', slug=f'tag{number}'
+        )
+        for number in range(3)
+    ]
+
+
+@pytest.fixture
+def ingredients(db):
+    return [
+        Ingredient.objects.create(
+            name=f'Ингредиент {number}', measurement_unit='г'
+        )
+        for number in range(10)
+    ]
+
+
+def create_recipe(author, tags, ingredients, name='Рецепт', amount=1):
+    recipe = Recipe.objects.create(
+        author=author,
+        name=name,
+        title=name,
+        text='Описание',
+        cooking_time=10,
+        image=IMAGE,
+    )
+    recipe.tags.set(tags)
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=amount)
+        for ingredient in ingredients
+    )
+    return recipe
+
+
+@pytest.fixture
+def make_recipe(user, tags, ingredients):
+    def make(author=None, name='Рецепт', amount=1, **kwargs):
+        return create_recipe(
+            author or user,
+            kwargs.get('tags', tags[:2]),
+            kwargs.get('ingredients', ingredients[:3]),
+            name=name,
+            amount=amount,
+        )
+    return make
+
+
+def image_bytes(size=(1600, 800), color='red', mode='RGB', image_format='PNG',
+                exif=None):
+    buffer = BytesIO()
+    options = {'exif': exif.tobytes()} if exif is not None else {}
+    Image.new(mode, size, color).save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def as_base64(content, image_format='png'):
+    return (
+        f'data:image/{image_format};base64,'
+        + base64.b64encode(content).decode()
+    )
+
+
+def recipe_payload(tags, ingredients, image):
+    return {
+        'name': 'Рецепт с картинкой',
+        'text': 'Описание',
+        'cooking_time': 10,
+        'tags': [tag.pk for tag in tags[:1]],
+        'ingredients': [{'id': ingredients[0].pk, 'amount': 5}],
+        'image': image,
+    }
@@ -0,0 +1,27 @@
+from foodgram.settings import *  # noqa: F401,F403
+
+SECRET_KEY = 'test'
+SHORT_LINK_SECRET = 'test-short-links'
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+    # Вторая база для тестов маршрутизации; данные в неё копируются
+    # тестами, миграции на неё не применяются.
+    'replica1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+}
+
+# Реплики включаются в отдельных тестах через override_settings.
+DATABASE_REPLICAS = []
+
+# Справочники сверяют версию с базой при каждом обращении.
+CATALOG_VERSION_CHECK_INTERVAL = 0
+
+CATALOG_SNAPSHOT_ROOT = ''
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
@@ -0,0 +1,87 @@
+import pytest
+
+from recipe import cart_totals
+from recipe.models import CartTotal, PantryChange, Recipe, ShoppingCart
+
+
+def cart_url(recipe):
+    return f'/api/recipes/{recipe.pk}/shopping_cart/'
+
+
+@pytest.mark.django_db
+def test_cart_row_rolls_back_with_totals(
+    user, user_client, make_recipe, monkeypatch
+):
+    recipe = make_recipe()
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('totals')
+
+    monkeypatch.setattr(cart_totals, 'add_recipe', fail)
+    with pytest.raises(RuntimeError):
+        user_client.post(cart_url(recipe))
+    assert not ShoppingCart.objects.filter(user=user).exists()
+
+
+@pytest.mark.django_db
+def test_cart_totals_follow_cart(user, user_client, make_recipe):
+    first = make_recipe(amount=2)
+    second = make_recipe(amount=3)
+    assert user_client.post(cart_url(first)).status_code == 201
+    assert user_client.post(cart_url(second)).status_code == 201
+    assert set(CartTotal.objects.filter(user=user).values_list(
+        'total', flat=True
+    )) == {5}
+    assert user_client.delete(cart_url(first)).status_code == 204
+    assert set(CartTotal.objects.filter(user=user).values_list(
+        'total', flat=True
+    )) == {3}
+
+
+@pytest.mark.django_db
+def test_refresh_tolerates_concurrent_insert(
+    user, another_user, make_recipe, ingredients, monkeypatch
+):
+    recipe = make_recipe(amount=2)
+    ShoppingCart.objects.create(user=user, recipe=recipe)
+    CartTotal.objects.filter(user=user).delete()
+    bulk_create = CartTotal.objects.bulk_create
+
+    def insert_first(objs, **kwargs):
+        # Другой запрос успел вставить ту же строку итогов.
+        CartTotal.objects.get_or_create(
+            user=user, ingredient=ingredients[0], defaults={'total': 40}
+        )
+        return bulk_create(objs, **kwargs)
+
+    monkeypatch.setattr(CartTotal.objects, 'bulk_create', insert_first)
+    cart_totals.refresh([recipe.pk], [item.pk for item in ingredients[:3]])
+    assert dict(CartTotal.objects.filter(user=user).values_list(
+        'ingredient_id', 'total'
+    )) == {item.pk: 2 for item in ingredients[:3]}
+
+
+@pytest.mark.django_db
+def test_recipe_ingredient_update_refreshes_totals(
+    user, user_client, make_recipe, ingredients,
+    django_capture_on_commit_callbacks
+):
+    recipe = make_recipe(amount=2)
+    ShoppingCart.objects.create(user=user, recipe=recipe)
+    PantryChange.objects.all().delete()
+    updated_at = Recipe.objects.get(pk=recipe.pk).updated_at
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.patch(
+            f'/api/recipes/{recipe.pk}/',
+            {'ingredients': [
+                {'id': ingredients[0].pk, 'amount': 9},
+                {'id': ingredients[5].pk, 'amount': 1},
+            ]},
+            format='json'
+        )
+    assert response.status_code == 200
+    assert dict(CartTotal.objects.filter(user=user).values_list(
+        'ingredient_id', 'total'
+    )) == {ingredients[0].pk: 9, ingredients[5].pk: 1}
+    assert Recipe.objects.get(pk=recipe.pk).updated_at > updated_at
+    assert PantryChange.objects.filter(recipe_id=recipe.pk).exists()
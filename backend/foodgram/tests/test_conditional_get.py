@@ -0,0 +1,108 @@
+import pytest
+
+from recipe.models import RecipeIngredient
+
+
+@pytest.fixture
+def recipe(make_recipe):
+    return make_recipe()
+
+
+def get_etag(api_client, url):
+    response = api_client.get(url)
+    assert response.status_code == 200
+    etag = response['ETag']
+    assert api_client.get(
+        url, HTTP_IF_NONE_MATCH=etag
+    ).status_code == 304
+    return etag
+
+
+def patch_recipe(recipe, user_client, tags, ingredients):
+    response = user_client.patch(
+        f'/api/recipes/{recipe.pk}/', {'cooking_time': 25}, format='json'
+    )
+    assert response.status_code == 200
+    return ('cooking_time', 25)
+
+
+def rename_tag(recipe, user_client, tags, ingredients):
+    tag = recipe.tags.first()
+    tag.name = 'Переименованный тег'
+    tag.save()
+    return ('tags', 'Переименованный тег')
+
+
+def rename_ingredient(recipe, user_client, tags, ingredients):
+    ingredient = recipe.ingredients.first()
+    ingredient.name = 'Переименованный ингредиент'
+    ingredient.save()
+    return ('ingredients', 'Переименованный ингредиент')
+
+
+def add_tag(recipe, user_client, tags, ingredients):
+    recipe.tags.add(tags[2])
+    return ('tags', tags[2].name)
+
+
+def change_amount(recipe, user_client, tags, ingredients):
+    row = RecipeIngredient.objects.filter(recipe=recipe).first()
+    row.amount = 7
+    row.save()
+    return ('ingredients', 7)
+
+
+def field_contains(data, field, expected):
+    value = data[field]
+    if isinstance(value, list):
+        return any(expected in item.values() for item in value)
+    return value == expected
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('change', [
+    patch_recipe, rename_tag, rename_ingredient, add_tag, change_amount,
+])
+@pytest.mark.parametrize('authenticated', [False, True])
+def test_recipe_etag_changes_with_representation(
+    client, user_client, recipe, tags, ingredients,
+    django_capture_on_commit_callbacks, change, authenticated
+):
+    api_client = user_client if authenticated else client
+    url = f'/api/recipes/{recipe.pk}/'
+    etag = get_etag(api_client, url)
+    with django_capture_on_commit_callbacks(execute=True):
+        field, expected = change(recipe, user_client, tags, ingredients)
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+    assert field_contains(response.data, field, expected)
+
+
+@pytest.mark.django_db
+def test_tag_list_etag_changes_on_rename(
+    client, tags, django_capture_on_commit_callbacks
+):
+    etag = get_etag(client, '/api/tags/')
+    with django_capture_on_commit_callbacks(execute=True):
+        tags[0].name = 'Переименованный тег'
+        tags[0].save()
+    response = client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.data[0]['name'] == 'Переименованный тег'
+
+
+@pytest.mark.django_db
+def test_ingredient_list_etag_changes_on_rename(
+    client, ingredients, django_capture_on_commit_callbacks
+):
+    url = '/api/ingredients/?name=Ингр'
+    etag = get_etag(client, url)
+    with django_capture_on_commit_callbacks(execute=True):
+        ingredients[0].name = 'Ингредиент переименованный'
+        ingredients[0].save()
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert 'Ингредиент переименованный' in {
+        item['name'] for item in response.data
+    }
@@ -0,0 +1,196 @@
+import hashlib
+from io import BytesIO
+from unittest import mock
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from PIL import Image
+
+from recipe.image_variants import (AVATAR_WIDTHS, RECIPE_IMAGE_WIDTHS,
+                                   VARIANT_FORMATS, create_image_variants,
+                                   variant_path)
+from recipe.models import Recipe, User
+from tests.conftest import as_base64, image_bytes, recipe_payload
+
+ORIENTATION = 0x0112
+CAMERA_MAKE = 0x010F
+
+
+def open_variant(content_hash, width, extension):
+    with default_storage.open(
+        variant_path(content_hash, width, extension)
+    ) as file:
+        image = Image.open(BytesIO(file.read()))
+        image.load()
+    return image
+
+
+def test_variants_for_every_width_and_format():
+    content = image_bytes()
+    content_hash, width = create_image_variants(
+        ContentFile(content, name='original.png'), RECIPE_IMAGE_WIDTHS
+    )
+    assert content_hash == hashlib.sha256(content).hexdigest()
+    assert width == 1600
+    for width in RECIPE_IMAGE_WIDTHS:
+        for extension, options in VARIANT_FORMATS.items():
+            variant = open_variant(content_hash, width, extension)
+            assert variant.format == options['format']
+            assert variant.size == (width, width // 2)
+
+
+def test_variants_are_not_upscaled_and_follow_orientation():
+    exif = Image.Exif()
+    exif[ORIENTATION] = 6
+    exif[CAMERA_MAKE] = 'Камера'
+    content = image_bytes(
+        size=(400, 200), image_format='JPEG', exif=exif
+    )
+    content_hash, width = create_image_variants(
+        ContentFile(content, name='photo.jpg'), RECIPE_IMAGE_WIDTHS
+    )
+    # Повёрнуто по EXIF: все ширины не меньше исходной дают одну копию.
+    assert width == 200
+    variant = open_variant(content_hash, 200, 'jpeg')
+    assert variant.size == (200, 400)
+    assert not variant.getexif()
+    for width in RECIPE_IMAGE_WIDTHS:
+        assert not default_storage.exists(
+            variant_path(content_hash, width, 'jpeg')
+        )
+
+
+def test_transparent_image_is_flattened_on_white():
+    content = image_bytes(size=(300, 300), color=(0, 0, 0, 0), mode='RGBA')
+    content_hash, _ = create_image_variants(
+        ContentFile(content, name='transparent.png'), (240,)
+    )
+    variant = open_variant(content_hash, 240, 'webp')
+    assert variant.convert('RGB').getpixel((10, 10)) == (255, 255, 255)
+
+
+def test_same_content_is_processed_once():
+    content = image_bytes()
+    create_image_variants(ContentFile(content, name='a.png'), AVATAR_WIDTHS)
+    with mock.patch.object(default_storage, 'save') as save:
+        create_image_variants(
+            ContentFile(content, name='b.png'), AVATAR_WIDTHS
+        )
+    save.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_created_recipe_has_srcset(user_client, tags, ingredients):
+    content = image_bytes()
+    response = user_client.post(
+        '/api/recipes/',
+        recipe_payload(tags, ingredients, as_base64(content)),
+        format='json'
+    )
+    assert response.status_code == 201
+    recipe = Recipe.objects.get(pk=response.data['id'])
+    assert recipe.image_hash == hashlib.sha256(content).hexdigest()
+    response = user_client.get(f'/api/recipes/{recipe.pk}/')
+    srcset = response.data['image_srcset']
+    assert set(srcset) == set(VARIANT_FORMATS)
+    for extension, value in srcset.items():
+        assert value == ', '.join(
+            'http://testserver' + default_storage.url(
+                variant_path(recipe.image_hash, width, extension)
+            ) + f' {width}w'
+            for width in RECIPE_IMAGE_WIDTHS
+        )
+
+
+@pytest.mark.django_db
+def test_srcset_lists_only_saved_widths(user_client, tags, ingredients):
+    response = user_client.post(
+        '/api/recipes/',
+        recipe_payload(
+            tags, ingredients, as_base64(image_bytes(size=(600, 300)))
+        ),
+        format='json'
+    )
+    recipe = Recipe.objects.get(pk=response.data['id'])
+    assert recipe.image_width == 600
+    srcset = user_client.get(
+        f'/api/recipes/{recipe.pk}/'
+    ).data['image_srcset']['webp']
+    assert [
+        candidate.split(' ')[1] for candidate in srcset.split(', ')
+    ] == ['240w', '480w', '600w']
+    for width in (240, 480, 600):
+        assert open_variant(recipe.image_hash, width, 'webp').width == width
+
+
+@pytest.mark.django_db
+def test_same_image_on_update_keeps_file(user_client, tags, ingredients):
+    image = as_base64(image_bytes())
+    response = user_client.post(
+        '/api/recipes/',
+        recipe_payload(tags, ingredients, image),
+        format='json'
+    )
+    recipe = Recipe.objects.get(pk=response.data['id'])
+    response = user_client.patch(
+        f'/api/recipes/{recipe.pk}/', {'image': image}, format='json'
+    )
+    assert response.status_code == 200
+    updated = Recipe.objects.get(pk=recipe.pk)
+    assert updated.image.name == recipe.image.name
+    assert updated.image_hash == recipe.image_hash
+
+
+@pytest.mark.django_db
+def test_avatar_variants(user, user_client):
+    content = image_bytes(size=(512, 512))
+    response = user_client.put(
+        '/api/users/me/avatar/', {'avatar': as_base64(content)},
+        format='json'
+    )
+    assert response.status_code == 200
+    user.refresh_from_db()
+    assert user.avatar_hash == hashlib.sha256(content).hexdigest()
+    for width in AVATAR_WIDTHS:
+        assert open_variant(user.avatar_hash, width, 'webp').size == (
+            width, width
+        )
+    assert user_client.get('/api/users/me/').data['avatar_srcset']
+    response = user_client.delete('/api/users/me/avatar/')
+    assert response.status_code == 204
+    assert User.objects.get(pk=user.pk).avatar_hash == ''
+
+
+@pytest.mark.django_db
+def test_command_fills_missing_variants(make_recipe):
+    content = image_bytes()
+    recipe = make_recipe()
+    recipe.image.save('old.png', ContentFile(content), save=False)
+    Recipe.objects.filter(pk=recipe.pk).update(
+        image=recipe.image.name, image_hash=''
+    )
+    call_command('generate_image_variants')
+    recipe.refresh_from_db()
+    assert recipe.image_hash == hashlib.sha256(content).hexdigest()
+    assert recipe.image_width == 1600
+    assert default_storage.exists(
+        variant_path(recipe.image_hash, RECIPE_IMAGE_WIDTHS[0], 'webp')
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_command_refreshes_etag_and_cached_recipe(client, make_recipe):
+    recipe = make_recipe()
+    recipe.image.save('old.png', ContentFile(image_bytes()), save=False)
+    Recipe.objects.filter(pk=recipe.pk).update(
+        image=recipe.image.name, image_hash=''
+    )
+    url = f'/api/recipes/{recipe.pk}/'
+    response = client.get(url)
+    assert response.data['image_srcset'] is None
+    call_command('generate_image_variants')
+    fresh = client.get(url)
+    assert fresh['ETag'] != response['ETag']
+    assert fresh.data['image_srcset']
@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from api.catalog_snapshots import write_ingredient_snapshots
+from api.ingredient_index import INGREDIENT_DEFAULT_LIMIT, INGREDIENT_MAX_LIMIT
+from recipe.models import Ingredient
+
+
+@pytest.fixture
+def catalog(db):
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'Ингредиент {number:04}', measurement_unit='г')
+        for number in range(INGREDIENT_MAX_LIMIT + 1)
+    )
+
+
+def names(client, query):
+    return [item['name'] for item in client.get(
+        f'/api/ingredients/{query}'
+    ).data]
+
+
+@pytest.mark.parametrize('query, count', [
+    ('', INGREDIENT_DEFAULT_LIMIT),
+    ('?name=', INGREDIENT_DEFAULT_LIMIT),
+    ('?name=инг&limit=0', INGREDIENT_DEFAULT_LIMIT),
+    ('?name=инг&limit=abc', INGREDIENT_DEFAULT_LIMIT),
+    ('?name=инг&limit=3', 3),
+    ('?limit=100000', INGREDIENT_MAX_LIMIT),
+])
+def test_ingredient_list_is_limited(client, catalog, query, count):
+    found = names(client, query)
+    assert len(found) == count
+    assert found[0] == 'Ингредиент 0000'
+
+
+def test_ingredient_snapshots_are_limited(catalog, tmp_path):
+    write_ingredient_snapshots(str(tmp_path))
+    for path in ('ingredients.json', 'ingredients/%D0%B8.json'):
+        with open(tmp_path / path, 'rb') as file:
+            assert len(json.load(file)) == INGREDIENT_DEFAULT_LIMIT
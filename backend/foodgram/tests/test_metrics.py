@@ -0,0 +1,23 @@
+import pytest
+
+URL = '/api/_metrics/'
+
+
+@pytest.mark.django_db
+def test_metrics_closed_without_configured_token(client, settings):
+    settings.METRICS_TOKEN = ''
+    assert client.get(URL).status_code == 403
+    client.credentials(HTTP_AUTHORIZATION='Bearer ')
+    assert client.get(URL).status_code == 403
+
+
+@pytest.mark.django_db
+def test_metrics_require_token(client, settings):
+    settings.METRICS_TOKEN = 'secret'
+    assert client.get(URL).status_code == 403
+    client.credentials(HTTP_AUTHORIZATION='Bearer wrong')
+    assert client.get(URL).status_code == 403
+    client.credentials(HTTP_AUTHORIZATION='Bearer secret')
+    response = client.get(URL)
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/plain')
@@ -0,0 +1,72 @@
+import pytest
+
+from api.pagination import RecipePagination
+
+RECIPES_COUNT = 12
+
+
+@pytest.fixture
+def recipes(make_recipe, user, another_user):
+    return [
+        make_recipe(author=another_user if number % 2 else user)
+        for number in range(RECIPES_COUNT)
+    ]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('page_size', [2, 10])
+@pytest.mark.parametrize('authenticated, cold_queries', [
+    # COUNT, id страницы, рецепты с автором, теги, ингредиенты.
+    (False, 5),
+    # И ещё токен, пока его нет в кеше.
+    (True, 6),
+])
+def test_recipe_list_queries_do_not_depend_on_page_size(
+    client, user_client, recipes, monkeypatch, django_assert_num_queries,
+    page_size, authenticated, cold_queries
+):
+    monkeypatch.setattr(RecipePagination, 'page_size', page_size)
+    api_client = user_client if authenticated else client
+    with django_assert_num_queries(cold_queries):
+        response = api_client.get('/api/recipes/')
+    assert len(response.data['results']) == page_size
+    # Данные рецептов и токен уже в кеше: остаются COUNT и id страницы.
+    with django_assert_num_queries(2):
+        response = api_client.get('/api/recipes/')
+    assert len(response.data['results']) == page_size
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('authenticated, cold_queries', [
+    # Рецепт с флагами, рецепт с автором для кеша, теги, ингредиенты.
+    (False, 4),
+    # И ещё токен, пока его нет в кеше.
+    (True, 5),
+])
+def test_recipe_detail_queries(
+    client, user_client, recipes, django_assert_num_queries,
+    authenticated, cold_queries
+):
+    api_client = user_client if authenticated else client
+    url = f'/api/recipes/{recipes[0].pk}/'
+    with django_assert_num_queries(cold_queries):
+        response = api_client.get(url)
+    assert response.data['id'] == recipes[0].pk
+    # Данные рецепта и токен уже в кеше: остаётся рецепт с флагами
+    # для ETag и полей пользователя.
+    with django_assert_num_queries(1):
+        response = api_client.get(url)
+    assert response.data['id'] == recipes[0].pk
+    assert response.data['ingredients']
+
+
+@pytest.mark.django_db
+def test_recipe_detail_cache_is_shared_between_users(
+    client, user_client, recipes, django_assert_num_queries
+):
+    url = f'/api/recipes/{recipes[0].pk}/'
+    client.get(url)
+    # Кеш прогрет анонимом: пользователю нужны только токен и флаги.
+    with django_assert_num_queries(2):
+        response = user_client.get(url)
+    assert response.data['is_favorited'] is False
@@ -0,0 +1,68 @@
+import pytest
+
+from api.pagination import RecipePagination
+
+
+def found(client, query):
+    response = client.get('/api/recipes/', {'search': query})
+    return [recipe['id'] for recipe in response.data['results']]
+
+
+@pytest.mark.django_db
+def test_search_matches_words_by_prefix(client, make_recipe):
+    borscht = make_recipe(name='Борщ украинский')
+    make_recipe(name='Блины')
+    assert found(client, 'борщ') == [borscht.pk]
+    assert found(client, 'укр бор') == [borscht.pk]
+    assert found(client, 'пельмени') == []
+
+
+@pytest.mark.django_db
+def test_search_ranks_name_above_text(client, make_recipe):
+    in_text = make_recipe(name='Суп')
+    in_text.text = 'Подаётся с гренками'
+    in_text.save()
+    in_name = make_recipe(name='Гренки с чесноком')
+    make_recipe(name='Каша')
+    assert found(client, 'гренк') == [in_name.pk, in_text.pk]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('query', ['', '   '])
+def test_empty_search_is_ignored(client, make_recipe, query):
+    first = make_recipe(name='Борщ')
+    second = make_recipe(name='Блины')
+    assert found(client, query) == [second.pk, first.pk]
+
+
+@pytest.mark.django_db
+def test_search_without_words_finds_nothing(client, make_recipe):
+    make_recipe(name='Борщ')
+    assert found(client, '!!!') == []
+
+
+@pytest.mark.django_db
+def test_search_falls_back_to_page_numbers(
+    client, make_recipe, settings, monkeypatch
+):
+    settings.RECIPE_CURSOR_PAGINATION = True
+    monkeypatch.setattr(RecipePagination, 'page_size', 1)
+    make_recipe(name='Борщ')
+    make_recipe(name='Борщ зелёный')
+    make_recipe(name='Блины')
+    assert 'count' not in client.get('/api/recipes/').data
+    response = client.get('/api/recipes/?search=борщ')
+    assert response.data['count'] == 2
+    assert 'page=2' in response.data['next']
+
+
+@pytest.mark.django_db
+def test_search_index_follows_recipe_changes(client, make_recipe):
+    recipe = make_recipe(name='Борщ')
+    assert found(client, 'борщ') == [recipe.pk]
+    recipe.name = recipe.title = 'Солянка'
+    recipe.save()
+    assert found(client, 'борщ') == []
+    assert found(client, 'солянка') == [recipe.pk]
+    recipe.delete()
+    assert found(client, 'солянка') == []
@@ -0,0 +1,37 @@
+import pytest
+
+from recipe.models import Recipe, RecipeIngredient
+from tests.conftest import as_base64, image_bytes, recipe_payload
+
+
+@pytest.mark.django_db
+def test_recipe_create_is_atomic(user_client, tags, ingredients, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError('ingredients')
+
+    monkeypatch.setattr(RecipeIngredient.objects, 'bulk_create', fail)
+    with pytest.raises(RuntimeError):
+        user_client.post(
+            '/api/recipes/',
+            recipe_payload(tags, ingredients, as_base64(image_bytes())),
+            format='json'
+        )
+    assert not Recipe.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_created_recipe_is_cached_with_ingredients(
+    user_client, tags, ingredients
+):
+    response = user_client.post(
+        '/api/recipes/',
+        recipe_payload(tags, ingredients, as_base64(image_bytes())),
+        format='json'
+    )
+    assert response.status_code == 201
+    recipe_id = response.data['id']
+    for _ in range(2):
+        response = user_client.get(f'/api/recipes/{recipe_id}/')
+        assert [
+            item['id'] for item in response.data['ingredients']
+        ] == [ingredients[0].pk]
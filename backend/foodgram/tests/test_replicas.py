@@ -0,0 +1,76 @@
+import pytest
+from django.db import connections
+from rest_framework.authtoken.models import Token
+
+from api.middleware import PRIMARY_COOKIE
+from tests.conftest import client_for, create_user
+
+replica_db = pytest.mark.django_db(
+    transaction=True, databases=['default', 'replica1']
+)
+
+
+@pytest.fixture
+def replica(settings):
+    settings.DATABASE_REPLICAS = ['replica1']
+    settings.REPLICA_STICKY_SECONDS = 60
+
+
+def replicate():
+    """Копирует основную базу в реплику целиком."""
+    for alias in ('default', 'replica1'):
+        connections[alias].ensure_connection()
+    connections['default'].connection.backup(
+        connections['replica1'].connection
+    )
+
+
+def recipe_ids(api_client):
+    response = api_client.get('/api/recipes/')
+    assert response.status_code == 200
+    return {recipe['id'] for recipe in response.data['results']}
+
+
+@replica_db
+def test_safe_requests_read_from_replica(replica, client, make_recipe):
+    replicated = make_recipe()
+    replicate()
+    make_recipe(name='Не на реплике')
+    assert recipe_ids(client) == {replicated.pk}
+
+
+@replica_db
+def test_reads_after_write_go_to_primary(
+    replica, user, client, make_recipe
+):
+    replicated = make_recipe()
+    user_client = client_for(user)
+    replicate()
+    fresh = make_recipe(name='Не на реплике')
+    response = user_client.post(f'/api/recipes/{replicated.pk}/favorite/')
+    assert response.status_code == 201
+    assert PRIMARY_COOKIE in response.cookies
+    assert recipe_ids(user_client) == {replicated.pk, fresh.pk}
+    # Без cookie клиент узнаётся по токену.
+    user_client.cookies.clear()
+    assert recipe_ids(user_client) == {replicated.pk, fresh.pk}
+    # Остальные клиенты по-прежнему читают с реплики.
+    assert recipe_ids(client) == {replicated.pk}
+
+
+@replica_db
+def test_token_missing_on_replica_is_checked_on_primary(replica, user):
+    replicate()
+    new_user = create_user(3)
+    token = Token.objects.create(user=new_user)
+    assert not Token.objects.using('replica1').filter(pk=token.pk).exists()
+    response = client_for(new_user).get('/api/users/me/')
+    assert response.status_code == 200
+    assert response.data['id'] == new_user.pk
+
+
+@replica_db
+def test_unknown_token_is_rejected_with_replicas(replica, client):
+    replicate()
+    client.credentials(HTTP_AUTHORIZATION='Token unknown')
+    assert client.get('/api/users/me/').status_code == 401
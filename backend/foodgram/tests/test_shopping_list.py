@@ -0,0 +1,114 @@
+import csv
+import io
+import json
+import re
+from collections import Counter
+
+import pytest
+from django.apps import apps
+
+from api.shopping_list import normalize_unit
+from recipe.cart_totals import rebuild_cart_totals
+from recipe.models import Ingredient, RecipeIngredient, ShoppingCart
+from tests.conftest import create_recipe
+
+CART_SIZE = 150
+INGREDIENTS_PER_RECIPE = 5
+URL = '/api/recipes/download_shopping_cart/'
+TEXT_LINE = re.compile(r'^(.+), кол-во (\d+) (.+)$')
+
+
+@pytest.fixture
+def large_cart(user, tags):
+    catalog = [
+        Ingredient.objects.create(
+            name=f'Продукт {number:02}', measurement_unit='г'
+        )
+        for number in range(40)
+    ]
+    # Единицы, отличающиеся только написанием, сливаются в одну строку.
+    catalog += [
+        Ingredient.objects.create(name='Яйцо', measurement_unit=unit)
+        for unit in ('шт', 'шт.')
+    ]
+    recipes = []
+    for number in range(CART_SIZE):
+        recipe = create_recipe(user, tags[:1], [], name=f'Рецепт {number}')
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=catalog[(number + shift) % len(catalog)],
+                amount=shift + 1 + number % 3
+            )
+            for shift in range(INGREDIENTS_PER_RECIPE)
+        )
+        recipes.append(recipe)
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=user, recipe=recipe) for recipe in recipes
+    )
+    rebuild_cart_totals(apps.get_model)
+    expected = Counter()
+    for name, unit, amount in RecipeIngredient.objects.values_list(
+        'ingredient__name', 'ingredient__measurement_unit', 'amount'
+    ):
+        expected[name, normalize_unit(unit)] += amount
+    return expected
+
+
+def parse_text(content):
+    return [
+        TEXT_LINE.match(line).groups() for line in content.splitlines()
+    ]
+
+
+def parse_csv(content):
+    header, *rows = csv.reader(io.StringIO(content))
+    assert header == ['Ингредиент', 'Количество', 'Единица']
+    return [(name, amount, unit) for name, amount, unit in rows]
+
+
+def parse_json(content):
+    return [
+        (item['name'], item['amount'], item['measurement_unit'])
+        for item in json.loads(content)
+    ]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('file_format, content_type, parse', [
+    ('txt', 'text/plain', parse_text),
+    ('csv', 'text/csv', parse_csv),
+    ('json', 'application/json', parse_json),
+])
+def test_large_cart_download(
+    user_client, large_cart, django_assert_num_queries,
+    file_format, content_type, parse
+):
+    response = user_client.get(URL, {'format': file_format})
+    assert response.status_code == 200
+    assert response.streaming
+    assert response['Content-Type'].startswith(content_type)
+    assert response['Content-Disposition'] == (
+        f'attachment; filename="list_of_ingredients.{file_format}"'
+    )
+    # Строки читаются одним запросом независимо от размера корзины.
+    with django_assert_num_queries(1):
+        content = b''.join(response.streaming_content).decode()
+    lines = parse(content)
+    assert len(lines) == len(large_cart)
+    assert {
+        (name, normalize_unit(unit)): int(amount)
+        for name, amount, unit in lines
+    } == large_cart
+    assert [line[0] for line in lines] == sorted(line[0] for line in lines)
+
+
+@pytest.mark.django_db
+def test_empty_cart_download_as_json(user_client):
+    response = user_client.get(URL, {'format': 'json'})
+    assert json.loads(b''.join(response.streaming_content)) == []
+
+
+@pytest.mark.django_db
+def test_download_requires_authentication(client):
+    assert client.get(URL).status_code == 401
@@ -0,0 +1,37 @@
+import pytest
+from django.apps import apps
+from django.core.exceptions import ImproperlyConfigured
+
+from recipe.models import Recipe
+from recipe.short_links import encode_short_link
+
+
+@pytest.mark.django_db
+def test_short_link_redirects_to_recipe(client, make_recipe):
+    recipe = make_recipe()
+    assert recipe.short == encode_short_link(recipe.pk)
+    response = client.get(f'/api/s/{recipe.short}/')
+    assert response.status_code == 302
+    assert response['Location'] == f'/recipes/{recipe.pk}'
+
+
+@pytest.mark.django_db
+def test_short_link_is_checked_against_stored_code(client, make_recipe):
+    recipe = make_recipe()
+    code = recipe.short
+    Recipe.objects.filter(pk=recipe.pk).update(short='LegacyCode')
+    assert client.get(f'/api/s/{code}/').status_code == 404
+    response = client.get('/api/s/LegacyCode/')
+    assert response.status_code == 302
+    assert response['Location'] == f'/recipes/{recipe.pk}'
+
+
+@pytest.mark.django_db
+def test_short_link_of_missing_recipe(client):
+    assert client.get(f'/api/s/{encode_short_link(1)}/').status_code == 404
+
+
+def test_startup_requires_short_link_secret(settings):
+    settings.SHORT_LINK_SECRET = ''
+    with pytest.raises(ImproperlyConfigured):
+        apps.get_app_config('recipe').ready()
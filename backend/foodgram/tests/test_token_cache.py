@@ -0,0 +1,37 @@
+import pytest
+from rest_framework.authtoken.models import Token
+
+from api.authentication import token_cache, token_cache_key
+from tests.conftest import client_for
+
+ME_URL = '/api/users/me/'
+
+
+@pytest.fixture
+def warm_client(user):
+    """Клиент, чей токен уже лежит в кеше."""
+    api_client = client_for(user)
+    assert api_client.get(ME_URL).status_code == 200
+    key = Token.objects.get(user=user).key
+    assert token_cache().get(token_cache_key(key)) is not None
+    return api_client
+
+
+@pytest.mark.django_db
+def test_logout_revokes_cached_token(warm_client):
+    response = warm_client.post('/api/auth/token/logout/')
+    assert response.status_code == 204
+    assert warm_client.get(ME_URL).status_code == 401
+
+
+@pytest.mark.django_db
+def test_deleted_token_row_revokes_cached_token(warm_client, user):
+    Token.objects.get(user=user).delete()
+    assert warm_client.get(ME_URL).status_code == 401
+
+
+@pytest.mark.django_db
+def test_deactivated_user_is_not_served_from_cache(warm_client, user):
+    user.is_active = False
+    user.save()
+    assert warm_client.get(ME_URL).status_code == 401